@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+import numpy as np
+
+from joint_angles import (JOINT_TRIPLES, LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, LEFT_WRIST, RIGHT_ANKLE,
+                          RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER, RIGHT_WRIST, joint_angles)
+
+# Indice del naso tra i landmark di MediaPipe Pose
+NOSE = 0
+
+# Le 23 caratteristiche in ingresso al modello di attività, nell'ordine del vettore:
+# 10 angoli articolari (gradi), inclinazione del busto (gradi, 0 = in piedi, 90 = orizzontale)
+# e 12 distanze e altezze divise per la lunghezza del busto (indipendenti da zoom e distanza).
+# Schema NUOVO, definito qui: le caratteristiche con cui è stato addestrato il modello storico
+# activity_recognition_model_training.keras non sono documentate, coincide solo la dimensione
+# (23). Le previsioni hanno senso solo con un modello riaddestrato su questo schema con
+# train_activity_model.py, che registra FEATURE_SCHEMA nel file del modello.
+FEATURE_NAMES = list(JOINT_TRIPLES) + [
+    "torso_inclination",
+    "shoulder_width",
+    "hip_width",
+    "wrist_distance",
+    "knee_distance",
+    "ankle_distance",
+    "wrist_ankle_left",
+    "wrist_ankle_right",
+    "hip_height",
+    "shoulder_height",
+    "wrist_height_left",
+    "wrist_height_right",
+    "nose_height",
+]
+NUM_FEATURES = len(FEATURE_NAMES)
+
+# Identificativo dello schema: cambia se cambiano nomi o ordine delle caratteristiche
+FEATURE_SCHEMA = hashlib.sha256(json.dumps(FEATURE_NAMES).encode()).hexdigest()[:12]
+
+# Coppie di landmark delle distanze, nell'ordine di FEATURE_NAMES
+DISTANCE_PAIRS = [
+    (LEFT_SHOULDER, RIGHT_SHOULDER),
+    (LEFT_HIP, RIGHT_HIP),
+    (LEFT_WRIST, RIGHT_WRIST),
+    (LEFT_KNEE, RIGHT_KNEE),
+    (LEFT_ANKLE, RIGHT_ANKLE),
+    (LEFT_WRIST, LEFT_ANKLE),
+    (RIGHT_WRIST, RIGHT_ANKLE),
+]
+
+# Lunghezza minima del busto (coordinate normalizzate) sotto cui le distanze non hanno senso
+MIN_TORSO = 1e-3
+
+
+# Caratteristiche di tutti i frame in un solo passaggio vettoriale: landmarks è un array
+# (N, 33, C) con C >= 2, il risultato un array (N, 23) float32. I frame senza posa (NaN)
+# restano NaN. Il calcolo è in float64 e non dipende da N: un frame dà lo stesso vettore
+# sia da solo sia dentro un batch.
+def extract_features(landmarks):
+    points = np.asarray(landmarks, dtype=np.float64)[:, :, :2]
+    features = np.empty((len(points), NUM_FEATURES))
+    angle_count = len(JOINT_TRIPLES)
+    features[:, :angle_count] = joint_angles(points)
+
+    mid_shoulder = (points[:, LEFT_SHOULDER] + points[:, RIGHT_SHOULDER]) / 2
+    mid_hip = (points[:, LEFT_HIP] + points[:, RIGHT_HIP]) / 2
+    mid_ankle = (points[:, LEFT_ANKLE] + points[:, RIGHT_ANKLE]) / 2
+    torso = mid_shoulder - mid_hip
+    torso_length = np.maximum(np.hypot(torso[:, 0], torso[:, 1]), MIN_TORSO)
+
+    # L'asse y delle immagini punta verso il basso
+    features[:, angle_count] = np.degrees(np.arctan2(np.abs(torso[:, 0]), -torso[:, 1]))
+    first, second = np.array(DISTANCE_PAIRS).T
+    offsets = points[:, first] - points[:, second]
+    distance_end = angle_count + 1 + len(DISTANCE_PAIRS)
+    features[:, angle_count + 1:distance_end] = np.hypot(offsets[..., 0], offsets[..., 1]) / torso_length[:, None]
+    heights = np.stack([
+        mid_ankle[:, 1] - mid_hip[:, 1],
+        mid_ankle[:, 1] - mid_shoulder[:, 1],
+        mid_shoulder[:, 1] - points[:, LEFT_WRIST, 1],
+        mid_shoulder[:, 1] - points[:, RIGHT_WRIST, 1],
+        mid_ankle[:, 1] - points[:, NOSE, 1],
+    ], axis=1)
+    features[:, distance_end:] = heights / torso_length[:, None]
+    return features.astype(np.float32)
+
+
+# Vettore (23,) float32 di un singolo frame (33, C), con lo stesso codice del batch
+def frame_features(landmarks):
+    return extract_features(np.asarray(landmarks)[None])[0]
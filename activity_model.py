@@ -0,0 +1,174 @@
+import io
+import json
+import zipfile
+
+import h5py
+import numpy as np
+
+# Modello di riconoscimento dell'attività addestrato con Keras
+MODEL_PATH = "activity_recognition_model_training.keras"
+
+# Funzioni di attivazione supportate nei layer Dense
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+}
+
+# Layer ignorati in inferenza
+PASSTHROUGH_LAYERS = ("InputLayer", "Dropout")
+
+
+# Softmax stabile per righe
+def softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    logits /= logits.sum(axis=1, keepdims=True)
+    return logits
+
+
+# Pesi di un layer dal file model.weights.h5 (formato Keras 3: layers/<nome>/vars/<i>)
+def _layer_vars(weights, name):
+    group = weights["layers"][name]["vars"]
+    return [np.asarray(group[str(i)], dtype=np.float64) for i in range(len(group))]
+
+
+# Legge config.json e model.weights.h5 dall'archivio .keras senza importare Keras.
+# Restituisce la lista dei layer come dizionari {"class_name", "config", "vars"}.
+def read_keras_layers(path=MODEL_PATH):
+    with zipfile.ZipFile(path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights_bytes = archive.read("model.weights.h5")
+    if config["class_name"] != "Sequential":
+        raise ValueError(f"Modello non supportato: {config['class_name']}")
+    layers = []
+    with h5py.File(io.BytesIO(weights_bytes), "r") as weights:
+        for layer in config["config"]["layers"]:
+            name = layer["config"]["name"]
+            layer_vars = _layer_vars(weights, name) if name in weights["layers"] else []
+            layers.append({"class_name": layer["class_name"], "config": layer["config"], "vars": layer_vars})
+    return layers
+
+
+# Trasformazione affine per canale equivalente a una BatchNormalization in inferenza:
+# gamma * (x - media) / sqrt(varianza + eps) + beta = x * scala + traslazione
+def _batchnorm_affine(config, layer_vars):
+    layer_vars = list(layer_vars)
+    gamma = layer_vars.pop(0) if config.get("scale", True) else None
+    beta = layer_vars.pop(0) if config.get("center", True) else None
+    mean, variance = layer_vars
+    scale = 1.0 / np.sqrt(variance + config.get("epsilon", 1e-3))
+    if gamma is not None:
+        scale = scale * gamma
+    shift = -mean * scale
+    if beta is not None:
+        shift = shift + beta
+    return scale, shift
+
+
+# Converte i layer Keras in una lista di (kernel, bias, attivazione) in float64.
+# Ogni BatchNormalization viene assorbita nel Dense successivo: (x * s + t) W + b
+# = x (s[:, None] * W) + (t W + b); Dropout e InputLayer vengono eliminati.
+def fold_layers(layers):
+    dense = []
+    pending = None
+    for layer in layers:
+        class_name, config = layer["class_name"], layer["config"]
+        if class_name in PASSTHROUGH_LAYERS:
+            continue
+        if class_name == "BatchNormalization":
+            scale, shift = _batchnorm_affine(config, layer["vars"])
+            if pending is not None:
+                scale, shift = pending[0] * scale, pending[1] * scale + shift
+            pending = (scale, shift)
+        elif class_name == "Dense":
+            activation = config.get("activation", "linear")
+            if activation not in ACTIVATIONS and not (activation == "softmax" and layer is layers[-1]):
+                raise ValueError(f"Attivazione non supportata: {activation}")
+            kernel = layer["vars"][0]
+            bias = layer["vars"][1] if config.get("use_bias", True) else np.zeros(kernel.shape[1])
+            if pending is not None:
+                bias = pending[1] @ kernel + bias
+                kernel = pending[0][:, None] * kernel
+                pending = None
+            dense.append((kernel, bias, activation))
+        else:
+            raise ValueError(f"Layer non supportato: {class_name}")
+    if pending is not None:
+        # BatchNormalization finale: diventa un Dense diagonale lineare
+        dense.append((np.diag(pending[0]), pending[1], "linear"))
+    return dense
+
+
+# Inferenza del modello di riconoscimento dell'attività in NumPy puro: pesi con le
+# BatchNormalization già assorbite, nessun Dropout, forward pass a batch.
+# Con dtype=np.float16 i pesi occupano metà memoria; i calcoli restano in float32
+# perché NumPy non ha prodotti matriciali BLAS in float16.
+class ActivityModel:
+    def __init__(self, dense, dtype=np.float32, class_names=None):
+        self.dtype = np.dtype(dtype)
+        self.compute_dtype = np.result_type(self.dtype, np.float32)
+        self.layers = [(kernel.astype(self.dtype), bias.astype(self.dtype), activation)
+                       for kernel, bias, activation in dense]
+        self.input_size = self.layers[0][0].shape[0]
+        self.output_size = self.layers[-1][0].shape[1]
+        # Il file .keras non contiene i nomi delle classi
+        self.class_names = list(class_names or (f"classe_{i}" for i in range(self.output_size)))
+        # Schema delle caratteristiche di ingresso (activity_features.FEATURE_SCHEMA) se noto
+        self.feature_schema = None
+
+    @classmethod
+    def from_keras(cls, path=MODEL_PATH, dtype=np.float32, class_names=None):
+        return cls(fold_layers(read_keras_layers(path)), dtype, class_names)
+
+    # Pesi già assorbiti salvati in un .npz: si caricano senza h5py
+    @classmethod
+    def from_npz(cls, path, dtype=np.float32, class_names=None):
+        with np.load(path) as archive:
+            count = len([key for key in archive.files if key.startswith("kernel_")])
+            dense = [(archive[f"kernel_{i}"], archive[f"bias_{i}"], str(archive[f"activation_{i}"]))
+                     for i in range(count)]
+            if class_names is None and "class_names" in archive.files:
+                class_names = [str(name) for name in archive["class_names"]]
+            feature_schema = str(archive["feature_schema"]) if "feature_schema" in archive.files else None
+        model = cls(dense, dtype, class_names)
+        model.feature_schema = feature_schema
+        return model
+
+    # Carica da .keras oppure da .npz secondo l'estensione
+    @classmethod
+    def load(cls, path=MODEL_PATH, dtype=np.float32, class_names=None):
+        if path.endswith(".npz"):
+            return cls.from_npz(path, dtype, class_names)
+        return cls.from_keras(path, dtype, class_names)
+
+    def save(self, path):
+        arrays = {"class_names": np.array(self.class_names)}
+        if self.feature_schema is not None:
+            arrays["feature_schema"] = np.array(self.feature_schema)
+        for i, (kernel, bias, activation) in enumerate(self.layers):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+            arrays[f"activation_{i}"] = np.array(activation)
+        np.savez(path, **arrays)
+        return path
+
+    # Probabilità delle classi per un batch (N, input_size) o un singolo vettore
+    def predict_proba(self, features):
+        x = np.asarray(features, dtype=self.compute_dtype)
+        if x.ndim == 1:
+            x = x[None, :]
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            x += bias
+            if activation == "softmax":
+                x = softmax(x)
+            else:
+                x = ACTIVATIONS[activation](x)
+        return x
+
+    # Indice della classe più probabile per ogni riga
+    def predict(self, features):
+        return self.predict_proba(features).argmax(axis=1)
+
+    def predict_names(self, features):
+        return [self.class_names[i] for i in self.predict(features)]
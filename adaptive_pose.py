@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+
+from joint_angles import landmarks_to_array
+from pose_analysis import PoseResult, detect_pose, landmarks_from_array
+
+# Visibilità minima perché un landmark contribuisca alla stima del movimento
+MIN_VISIBILITY = 0.5
+
+
+# Inferenza adattiva: sostituisce pose senza cambiare l'interfaccia (process(rgb_frame)).
+# La rete gira solo sui keyframe; nei frame intermedi i landmark sono estrapolati in modo
+# lineare dagli ultimi due keyframe. L'intervallo tra keyframe viene scelto in modo che lo
+# spostamento previsto dei landmark tra due inferenze non superi max_step (coordinate
+# normalizzate): con atleta fermo si arriva a max_interval, con movimento rapido si
+# torna a un'inferenza per frame.
+class AdaptivePose:
+    def __init__(self, pose, max_interval=4, max_step=0.02):
+        self.pose = pose
+        self.max_interval = max_interval
+        self.max_step = max_step
+        self._reset_state()
+
+    def _reset_state(self):
+        self.interval = 1
+        self.frames = 0
+        self.inferences = 0
+        self._since_keyframe = 0
+        self._last = None
+        self._velocity = None
+        self._started = None
+
+    # Velocità massima (per frame) dei landmark visibili tra gli ultimi due keyframe
+    def _update_motion(self, landmarks, frames_elapsed):
+        if self._last is None:
+            self._velocity = None
+            self.interval = 1
+            return
+        velocity = (landmarks[:, :3] - self._last[:, :3]) / frames_elapsed
+        visible = (landmarks[:, 3] > MIN_VISIBILITY) & (self._last[:, 3] > MIN_VISIBILITY)
+        self._velocity = velocity
+        speed = np.max(np.abs(velocity[visible, :2])) if visible.any() else 0.0
+        target = self.max_interval if speed <= 0 else int(np.clip(self.max_step // speed, 1, self.max_interval))
+        # L'intervallo scende subito quando il movimento accelera, ma sale al massimo del doppio
+        self.interval = min(target, 2 * self.interval)
+
+    def process(self, rgb_frame):
+        return self._step(lambda: self.pose.process(rgb_frame))
+
+    # Come process, ma su frame BGR: nei frame estrapolati non serve nemmeno la conversione
+    def process_bgr(self, frame):
+        return self._step(lambda: detect_pose(self.pose, frame))
+
+    def _step(self, infer):
+        if self._started is None:
+            self._started = time.perf_counter()
+        self.frames += 1
+        self._since_keyframe += 1
+
+        # Frame intermedio: estrapolazione dall'ultimo keyframe
+        if self._last is not None and self._velocity is not None and self._since_keyframe < self.interval:
+            predicted = self._last.copy()
+            predicted[:, :3] += self._velocity * self._since_keyframe
+            return PoseResult(landmarks_from_array(predicted))
+
+        # Keyframe: inferenza completa
+        result = infer()
+        self.inferences += 1
+        if result.pose_landmarks:
+            landmarks = landmarks_to_array(result.pose_landmarks.landmark)
+            self._update_motion(landmarks, self._since_keyframe)
+            self._last = landmarks
+        else:
+            self._last = None
+            self._velocity = None
+            self.interval = 1
+        self._since_keyframe = 0
+        return result
+
+    def reset(self):
+        self.pose.reset()
+        self._reset_state()
+
+    # Rapporto inferenze/frame e FPS effettivi della sessione
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "inference_ratio": self.inferences / self.frames if self.frames else 0.0,
+            "effective_fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "keyframe_interval": self.interval,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Inferenza adattiva: {stats['inferences']}/{stats['frames']} frame "
+              f"({stats['inference_ratio']:.0%}), {stats['effective_fps']:.1f} fps effettivi")
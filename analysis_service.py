@@ -0,0 +1,389 @@
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import re
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import database as db
+from batch_analysis import _analyze_in_worker, _init_worker
+from pose_analysis import REP_ANGLE_THRESHOLD
+from pose_cache import DEFAULT_MAX_BYTES
+
+# Cartelle di default per i video caricati e i risultati
+UPLOAD_DIR = os.path.join("service_data", "uploads")
+RESULT_DIR = os.path.join("service_data", "results")
+
+# Limiti di default: lavori accettati (in coda + in esecuzione) e dimensione di un upload
+DEFAULT_MAX_PENDING = 32
+DEFAULT_MAX_UPLOAD_BYTES = 2 * 1024 ** 3
+
+# Dimensione dei blocchi letti dal socket durante l'upload
+UPLOAD_CHUNK = 1024 * 1024
+
+# Lavori recenti su cui si calcolano le metriche di durata
+METRICS_WINDOW = 1000
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 409: "Conflict",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+SQL_INSERT_JOB = ("INSERT INTO jobs (id, status, filename, video_path, user_id, created_at, upload_seconds) "
+                  "VALUES (?, 'queued', ?, ?, ?, ?, ?)")
+SQL_START_JOB = "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?"
+SQL_FINISH_JOB = ("UPDATE jobs SET status = 'done', finished_at = ?, frames = ?, repetitions = ?, result_path = ?, "
+                  "analysis_seconds = ? WHERE id = ?")
+SQL_FAIL_JOB = "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?"
+JOB_COLUMNS = ("id", "status", "filename", "user_id", "created_at", "upload_seconds", "started_at", "finished_at",
+               "analysis_seconds", "frames", "repetitions", "result_path", "error")
+SQL_GET_JOB = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?"
+SQL_JOB_INPUT = "SELECT video_path, user_id, created_at FROM jobs WHERE id = ?"
+SQL_REQUEUE = "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+SQL_QUEUED = "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+
+JOB_ROUTE = re.compile(r"^/jobs/([0-9a-f]{32})(/result)?$")
+
+
+# Coda persistente dei lavori: sopravvive ai riavvii del servizio
+def initialize_jobs(path=db.DATABASE):
+    db.initialize_db(path)
+    with db.transaction(path) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                            id TEXT PRIMARY KEY,
+                            status TEXT NOT NULL,
+                            filename TEXT,
+                            video_path TEXT,
+                            user_id INTEGER,
+                            created_at REAL,
+                            upload_seconds REAL,
+                            started_at REAL,
+                            finished_at REAL,
+                            analysis_seconds REAL,
+                            frames INTEGER,
+                            repetitions INTEGER,
+                            result_path TEXT,
+                            error TEXT
+                        )''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        # I lavori interrotti da un arresto del servizio tornano in coda
+        conn.execute(SQL_REQUEUE)
+
+
+# Stato di un lavoro come dizionario JSON, con i tempi di ogni fase
+def job_status(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    if job["started_at"] is not None:
+        job["queue_seconds"] = job["started_at"] - job["created_at"]
+    if job["finished_at"] is not None and job["started_at"] is not None:
+        job["run_seconds"] = job["finished_at"] - job["started_at"]
+        job["total_seconds"] = job["finished_at"] - job["created_at"] + (job["upload_seconds"] or 0.0)
+    return job
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+# Servizio HTTP locale per l'analisi dei video: upload in streaming su disco, coda
+# persistente in SQLite e pool limitato di processi che riusano analyze_video_file.
+# Oltre max_pending lavori accettati i nuovi upload ricevono 503 con Retry-After.
+class AnalysisService:
+    def __init__(self, database=db.DATABASE, workers=2, max_pending=DEFAULT_MAX_PENDING,
+                 max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES, upload_dir=UPLOAD_DIR, result_dir=RESULT_DIR,
+                 pose_config=None, cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES, threshold=REP_ANGLE_THRESHOLD):
+        self.database = database
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_upload_bytes = max_upload_bytes
+        self.upload_dir = upload_dir
+        self.result_dir = result_dir
+        self.threshold = threshold
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(pose_config or {}, cache_dir, cache_bytes))
+        self.queue = None
+        self.pending = 0
+        self.rejected = 0
+        self.completed = deque(maxlen=METRICS_WINDOW)
+        self.completed_count = 0
+        self.failed = 0
+        self._tasks = []
+
+    def _db(self):
+        return db.get_connection(self.database)
+
+    async def start(self, host="127.0.0.1", port=8080):
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+        initialize_jobs(self.database)
+        self.queue = asyncio.Queue()
+        for (job_id,) in self._db().execute(SQL_QUEUED).fetchall():
+            self.queue.put_nowait(job_id)
+            self.pending += 1
+        self._tasks = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Servizio di analisi su http://{host}:{port} ({self.workers} processi, "
+              f"{self.pending} lavori ripresi dalla coda)")
+        return server
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # Un dispatcher per processo del pool: prende il prossimo lavoro e attende il risultato.
+    # Un errore di un lavoro (analisi o database) fa fallire solo quel lavoro, non il dispatcher.
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run_job(loop, job_id)
+            except Exception as exc:
+                self.failed += 1
+                print(f"Lavoro {job_id} non riuscito: {exc}")
+                try:
+                    await loop.run_in_executor(None, self._fail_job, job_id, str(exc))
+                except Exception as db_exc:
+                    print(f"Impossibile registrare il fallimento del lavoro {job_id}: {db_exc}")
+            finally:
+                self.pending -= 1
+            # Concluso o fallito, il video caricato non serve più
+            try:
+                await loop.run_in_executor(None, self._remove_upload, job_id)
+            except Exception as exc:
+                print(f"Impossibile eliminare il video del lavoro {job_id}: {exc}")
+
+    # Le transazioni SQLite girano nel pool di thread di default: una scrittura in attesa
+    # del lock del database non blocca l'event loop (upload e richieste di stato)
+    async def _run_job(self, loop, job_id):
+        job, started = await loop.run_in_executor(None, self._start_job, job_id)
+        summary = await loop.run_in_executor(self.pool, _analyze_in_worker, job[0], self.result_dir, self.threshold)
+        finished = await loop.run_in_executor(None, self._finish_job, job_id, job, summary)
+        self.completed.append({"queue": started - job[2], "run": finished - started,
+                               "analysis": summary["seconds"], "frames": summary["frames"]})
+        self.completed_count += 1
+
+    def _start_job(self, job_id):
+        job = self._db().execute(SQL_JOB_INPUT, (job_id,)).fetchone()
+        started = time.time()
+        with db.transaction(self.database) as conn:
+            conn.execute(SQL_START_JOB, (started, job_id))
+        return job, started
+
+    def _finish_job(self, job_id, job, summary):
+        # I campioni vanno scritti prima della transazione: il thread di SampleRecorder
+        # attenderebbe il lock tenuto qui
+        session_id = self._record_samples(job[1], summary["csv"]) if job[1] is not None else None
+        finished = time.time()
+        with db.transaction(self.database) as conn:
+            conn.execute(SQL_FINISH_JOB, (finished, summary["frames"], summary["repetitions"], summary["csv"],
+                                          summary["seconds"], job_id))
+            if job[1] is not None:
+                db.save_report(job[1], datetime.now().strftime('%Y%m%d_%H%M%S'), summary["repetitions"],
+                               summary["csv"], session_id, self.database)
+        return finished
+
+    # Serie della sessione in session_samples a partire dalle righe del CSV del risultato,
+    # così il riepilogo del report ha durata, angoli e tempo medio
+    def _record_samples(self, user_id, csv_path):
+        samples = db.SampleRecorder(user_id, path=self.database)
+        with open(csv_path, newline="") as f:
+            rows = csv.reader(f)
+            next(rows, None)
+            for timestamp, repetitions, angle in rows:
+                samples.record(timestamp, int(repetitions), float(angle))
+        return samples.close()
+
+    def _fail_job(self, job_id, error):
+        with db.transaction(self.database) as conn:
+            conn.execute(SQL_FAIL_JOB, (time.time(), error, job_id))
+
+    def _remove_upload(self, job_id):
+        row = self._db().execute(SQL_JOB_INPUT, (job_id,)).fetchone()
+        if row is not None and row[0] and os.path.exists(row[0]):
+            os.remove(row[0])
+
+    def _insert_job(self, job_id, filename, video_path, user_id, upload_seconds):
+        with db.transaction(self.database) as conn:
+            conn.execute(SQL_INSERT_JOB, (job_id, filename, video_path, user_id, time.time(), upload_seconds))
+
+    def _get_job(self, job_id):
+        return self._db().execute(SQL_GET_JOB, (job_id,)).fetchone()
+
+    @staticmethod
+    def _read_file(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            status, body, extra = await self._route(method, url.path, parse_qs(url.query), headers, reader, writer)
+            await self._respond(writer, status, body, extra)
+        except Exception as exc:
+            await self._respond(writer, 500, {"error": str(exc)})
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, headers, reader, writer):
+        if method == "POST" and path == "/jobs":
+            return await self._upload(query, headers, reader, writer)
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics(), None
+        match = JOB_ROUTE.match(path)
+        if method == "GET" and match:
+            loop = asyncio.get_running_loop()
+            row = await loop.run_in_executor(None, self._get_job, match.group(1))
+            if row is None:
+                return 404, {"error": "lavoro non trovato"}, None
+            job = job_status(row)
+            if not match.group(2):
+                return 200, job, None
+            if job["status"] != "done":
+                return 409, {"error": f"lavoro {job['status']}"}, None
+            result = await loop.run_in_executor(None, self._read_file, job["result_path"])
+            return 200, result, {"Content-Type": "text/csv"}
+        return 404, {"error": "percorso non trovato"}, None
+
+    # Upload in streaming su disco; la contropressione scatta prima di leggere il corpo.
+    # I client che inviano "Expect: 100-continue" non trasmettono il video se la coda è piena.
+    async def _upload(self, query, headers, reader, writer):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            return 503, {"error": "coda piena", "pending": self.pending}, {"Retry-After": "5"}
+        if "content-length" not in headers:
+            return 411, {"error": "Content-Length obbligatorio"}, None
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            return 400, {"error": "Content-Length non valido"}, None
+        if length > self.max_upload_bytes:
+            return 413, {"error": "video troppo grande"}, None
+        try:
+            user_id = int(query["user_id"][0]) if "user_id" in query else None
+        except ValueError:
+            return 400, {"error": "user_id non valido"}, None
+
+        job_id = uuid.uuid4().hex
+        filename = os.path.basename(headers.get("x-filename", "video.mp4"))
+        video_path = os.path.join(self.upload_dir, f"{job_id}_{filename}")
+        # Il posto in coda viene riservato subito, così upload concorrenti non superano il limite
+        self.pending += 1
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        # Scritture su disco e INSERT nel pool di thread di default, come le transazioni dei lavori.
+        # Se qualcosa fallisce prima che il lavoro sia in coda, il posto e il file vengono liberati.
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            f = await loop.run_in_executor(None, open, video_path, "wb")
+            try:
+                remaining = length
+                while remaining:
+                    chunk = await reader.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        raise ConnectionError("upload interrotto")
+                    await loop.run_in_executor(None, f.write, chunk)
+                    remaining -= len(chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+            upload_seconds = time.perf_counter() - start
+            await loop.run_in_executor(None, self._insert_job, job_id, filename, video_path, user_id, upload_seconds)
+        except Exception:
+            self.pending -= 1
+            if os.path.exists(video_path):
+                os.remove(video_path)
+            raise
+        self.queue.put_nowait(job_id)
+        return 202, {"id": job_id, "status": "queued", "pending": self.pending}, {"Location": f"/jobs/{job_id}"}
+
+    def metrics(self):
+        runs = [job["run"] for job in self.completed]
+        waits = [job["queue"] for job in self.completed]
+        frames = sum(job["frames"] for job in self.completed)
+        analysis = sum(job["analysis"] for job in self.completed)
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "completed": self.completed_count,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "run_seconds_mean": sum(runs) / len(runs) if runs else None,
+            "run_seconds_p95": _percentile(runs, 0.95),
+            "queue_seconds_mean": sum(waits) / len(waits) if waits else None,
+            "queue_seconds_p95": _percentile(waits, 0.95),
+            "frames_per_second": frames / analysis if analysis > 0 else None,
+        }
+
+    async def _respond(self, writer, status, body, extra=None):
+        headers = {"Content-Type": "application/json", "Connection": "close"}
+        headers.update(extra or {})
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        headers["Content-Length"] = str(len(body))
+        head = f"HTTP/1.1 {status} {REASONS[status]}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+async def serve(args):
+    service = AnalysisService(args.database, args.workers, args.max_pending, args.max_upload_mb * 1024 ** 2,
+                              args.upload_dir, args.result_dir, {"model_complexity": args.model_complexity},
+                              args.cache_dir, threshold=args.threshold)
+    server = await service.start(args.host, args.port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio HTTP locale per l'analisi dei video in coda")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=int, default=2, help="processi di analisi")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="lavori accettati prima di rispondere 503")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_BYTES // 1024 ** 2)
+    parser.add_argument("--database", default=db.DATABASE)
+    parser.add_argument("--upload-dir", default=UPLOAD_DIR)
+    parser.add_argument("--result-dir", default=RESULT_DIR)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--threshold", type=float, default=REP_ANGLE_THRESHOLD)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
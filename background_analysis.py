@@ -0,0 +1,101 @@
+import queue
+import threading
+
+from realtime_pipeline import put_latest
+
+
+# Analisi in un thread separato dal mainloop di Tk. Il worker riceve la sessione e la usa
+# per pubblicare l'avanzamento (report), l'anteprima dei frame (show) e per controllare
+# l'annullamento (cancelled). Sul thread di Tk un callback root.after svuota le code:
+# chiama on_progress con l'ultimo avanzamento, mostra l'ultimo frame con cv2.imshow (le
+# finestre di OpenCV restano sul thread principale) e a fine lavoro chiama on_done o on_error.
+class AnalysisSession:
+    def __init__(self, root, target, on_progress=None, on_done=None, on_error=None, window_name=None, poll_ms=30):
+        self.root = root
+        self.target = target
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.window_name = window_name
+        self.poll_ms = poll_ms
+        self.cancelled = threading.Event()
+        self._events = queue.Queue()
+        self._frames = queue.Queue(maxsize=1)
+        self._window_open = False
+        self._thread = threading.Thread(target=self._run, name="analisi", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self.root.after(self.poll_ms, self._poll)
+        return self
+
+    # Chiamato dal worker: avanzamento come dizionario (frame, totale, ripetizioni, ...)
+    def report(self, **progress):
+        self._events.put(("progress", progress))
+
+    # Chiamato dal worker: anteprima del frame elaborato, conta solo il più recente
+    def show(self, frame):
+        if self.window_name:
+            put_latest(self._frames, frame)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        try:
+            self._events.put(("done", self.target(self)))
+        except Exception as exc:
+            self._events.put(("error", exc))
+
+    def _poll(self):
+        progress = None
+        finished = None
+        while True:
+            try:
+                kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                progress = value
+            else:
+                finished = (kind, value)
+        if progress is not None and self.on_progress:
+            self.on_progress(progress)
+        self._show_latest_frame()
+
+        if finished is None:
+            self.root.after(self.poll_ms, self._poll)
+            return
+        self._close_window()
+        kind, value = finished
+        if kind == "done" and self.on_done:
+            self.on_done(value)
+        elif kind == "error":
+            if self.on_error:
+                self.on_error(value)
+            else:
+                raise value
+
+    def _show_latest_frame(self):
+        try:
+            frame = self._frames.get_nowait()
+        except queue.Empty:
+            frame = None
+        if frame is None and not self._window_open:
+            return
+        import cv2
+        if frame is not None:
+            cv2.imshow(self.window_name, frame)
+            self._window_open = True
+        # Premi 'q' nella finestra dell'anteprima per annullare
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.cancel()
+
+    def _close_window(self):
+        if self._window_open:
+            import cv2
+            cv2.destroyWindow(self.window_name)
+            self._window_open = False
@@ -0,0 +1,110 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pose_analysis import REP_ANGLE_THRESHOLD, analyze_video_file, mp_pose
+from pose_cache import DEFAULT_MAX_BYTES, PoseCache
+
+# Estensioni dei video considerate quando si passa una cartella
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Istanza di MediaPipe Pose, configurazione e cache del processo worker (una per processo)
+_worker_pose = None
+_worker_config = None
+_worker_cache = None
+
+
+# Inizializzatore dei worker: crea il grafo di MediaPipe una sola volta per processo
+def _init_worker(pose_config, cache_dir=None, cache_bytes=DEFAULT_MAX_BYTES):
+    global _worker_pose, _worker_config, _worker_cache
+    _worker_pose = mp_pose.Pose(**pose_config)
+    _worker_config = pose_config
+    if cache_dir:
+        _worker_cache = PoseCache(cache_dir, cache_bytes)
+
+
+# Analizza un video nel worker riusando la sua istanza di Pose
+def _analyze_in_worker(video_path, output_dir, threshold=REP_ANGLE_THRESHOLD):
+    _worker_pose.reset()
+    start = time.perf_counter()
+    summary = analyze_video_file(video_path, _worker_pose, output_dir, _worker_cache, _worker_config, threshold)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+# Espande cartelle, pattern glob e singoli file nella lista ordinata dei video
+def collect_videos(inputs):
+    videos = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in os.listdir(item):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.add(os.path.join(item, name))
+        else:
+            videos.update(path for path in glob.glob(item) if os.path.isfile(path))
+    return sorted(videos)
+
+
+# Analizza i video su un pool di processi e restituisce i riepiloghi e il throughput
+def run_batch(videos, output_dir=None, workers=None, pose_config=None, cache_dir=None,
+              cache_bytes=DEFAULT_MAX_BYTES, threshold=REP_ANGLE_THRESHOLD):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pose_config or {}, cache_dir, cache_bytes)) as executor:
+        futures = {executor.submit(_analyze_in_worker, video, output_dir, threshold): video for video in videos}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+            except Exception as exc:
+                errors.append((futures[future], exc))
+                print(f"Errore su {futures[future]}: {exc}")
+                continue
+            results.append(summary)
+            origin = " (cache)" if summary["cached"] else ""
+            print(f"{summary['video']}: {summary['frames']} frame{origin}, "
+                  f"{summary['repetitions']} ripetizioni in {summary['seconds']:.2f} s")
+
+    elapsed = time.perf_counter() - start
+    frames = sum(summary["frames"] for summary in results)
+    return {
+        "results": results,
+        "errors": errors,
+        "seconds": elapsed,
+        "videos_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+        "frames_per_second": frames / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analisi batch dei video senza interfaccia grafica")
+    parser.add_argument("inputs", nargs="+", help="cartelle, pattern glob o file video")
+    parser.add_argument("-o", "--output-dir", default=None, help="cartella per i file analysis_*.csv")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="numero di processi (default: tutti i core)")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument("--threshold", type=float, default=REP_ANGLE_THRESHOLD,
+                        help="angolo schiena-femore sotto cui si conta una ripetizione")
+    parser.add_argument("--cache-dir", default=None, help="cartella della cache dei landmark")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help="dimensione massima della cache in MB")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.inputs)
+    if not videos:
+        print("Errore: nessun video trovato.")
+        return 1
+
+    summary = run_batch(videos, args.output_dir, args.workers, {"model_complexity": args.model_complexity},
+                        args.cache_dir, args.cache_size_mb * 1024 ** 2, args.threshold)
+    print(f"Analizzati {len(summary['results'])}/{len(videos)} video in {summary['seconds']:.1f} s: "
+          f"{summary['videos_per_second']:.2f} video/s, {summary['frames_per_second']:.1f} frame/s")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
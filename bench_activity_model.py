@@ -0,0 +1,88 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from activity_model import MODEL_PATH, ActivityModel, read_keras_layers, softmax
+
+
+# Forward pass di riferimento in float64 layer per layer, senza assorbire le BatchNormalization
+def reference_forward(layers, features):
+    x = np.asarray(features, dtype=np.float64)
+    for layer in layers:
+        config, layer_vars = layer["config"], layer["vars"]
+        if layer["class_name"] == "Dense":
+            x = x @ layer_vars[0] + layer_vars[1]
+            if config["activation"] == "relu":
+                x = np.maximum(x, 0)
+            elif config["activation"] == "softmax":
+                x = softmax(x)
+        elif layer["class_name"] == "BatchNormalization":
+            gamma, beta, mean, variance = layer_vars
+            x = gamma * (x - mean) / np.sqrt(variance + config["epsilon"]) + beta
+    return x
+
+
+# Uscita di Keras sugli stessi input, solo se TensorFlow/Keras è installato
+def keras_forward(path, features):
+    try:
+        import keras
+    except ImportError:
+        return None
+    model = keras.saving.load_model(path, compile=False)
+    return model.predict(features, verbose=0)
+
+
+def compare(name, expected, actual):
+    diff = np.abs(expected - actual).max()
+    agreement = (expected.argmax(axis=1) == actual.argmax(axis=1)).mean()
+    print(f"{name:28s} differenza massima {diff:.2e}, stessa classe {agreement:.2%}")
+    return diff
+
+
+# Tempo medio per chiamata (s) di fn su repeat ripetizioni
+def measure(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parità e prestazioni dell'inferenza NumPy del modello di attività")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--samples", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    model32 = ActivityModel.from_keras(args.model)
+    print(f"Caricamento: {(time.perf_counter() - start) * 1e3:.1f} ms, TensorFlow importato: {'tensorflow' in sys.modules}")
+    model16 = ActivityModel.from_keras(args.model, dtype=np.float16)
+
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(args.samples, model32.input_size))
+    reference = reference_forward(read_keras_layers(args.model), features)
+
+    failed = compare("float32 vs riferimento", reference, model32.predict_proba(features)) > 1e-4
+    compare("float16 vs riferimento", reference, model16.predict_proba(features).astype(np.float64))
+    keras_output = keras_forward(args.model, features.astype(np.float32))
+    if keras_output is None:
+        print("Keras non installato: confronto con Keras saltato")
+    else:
+        failed |= compare("float32 vs Keras", keras_output, model32.predict_proba(features)) > 1e-4
+
+    single = features[:1].astype(np.float32)
+    batch = features[:256].astype(np.float32)
+    for name, model in (("float32", model32), ("float16", model16)):
+        per_frame = measure(lambda: model.predict_proba(single), args.repeat)
+        per_batch = measure(lambda: model.predict_proba(batch), max(1, args.repeat // 20))
+        print(f"{name}: {per_frame * 1e6:7.1f} µs per frame singolo, "
+              f"{per_batch / len(batch) * 1e6:7.2f} µs per frame in batch da {len(batch)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from joint_angles import (JOINT_TRIPLES, LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, calculate_angle, frame_angles,
+                          joint_angles, landmarks_to_array)
+
+
+# Calcolo frame per frame e articolazione per articolazione
+def scalar_angles(landmarks, triples):
+    result = np.empty((len(landmarks), len(triples)))
+    for n, frame in enumerate(landmarks):
+        for k, (a, b, c) in enumerate(triples):
+            result[n, k] = calculate_angle(frame[a, :2].tolist(), frame[b, :2].tolist(), frame[c, :2].tolist())
+    return result
+
+
+# I due angoli di process_frame come nel codice originale: attributi dei landmark di MediaPipe
+def legacy_frame_angles(landmarks):
+    shoulder = [landmarks[LEFT_SHOULDER].x, landmarks[LEFT_SHOULDER].y]
+    hip = [landmarks[LEFT_HIP].x, landmarks[LEFT_HIP].y]
+    knee = [landmarks[LEFT_KNEE].x, landmarks[LEFT_KNEE].y]
+    ankle = [landmarks[LEFT_ANKLE].x, landmarks[LEFT_ANKLE].y]
+    return calculate_angle(shoulder, hip, knee), calculate_angle(hip, knee, ankle)
+
+
+# Percorso a singolo frame di process_frame: dai landmark di MediaPipe ai due angoli
+def single_frame_paths(frame, repeat):
+    from pose_analysis import landmarks_from_array
+
+    landmarks = landmarks_from_array(frame).landmark
+    joints = ("back_thigh_left", "knee_left")
+    paths = {
+        "originale (attributi)": lambda: legacy_frame_angles(landmarks),
+        "joint_angles(frame[None])": lambda: joint_angles(landmarks_to_array(landmarks)[None], joints)[0],
+        "frame_angles (array)": lambda: frame_angles(landmarks_to_array(landmarks), joints),
+        "frame_angles (landmark)": lambda: frame_angles(landmarks, joints),
+    }
+    expected = np.array(legacy_frame_angles(landmarks))
+    for name, path in paths.items():
+        difference = np.max(np.abs(np.asarray(path()) - expected))
+        elapsed = min(timeit.repeat(path, number=1000, repeat=repeat)) / 1000
+        print(f"  {name:28s} {elapsed * 1e6:7.1f} us (differenza {difference:.1e} gradi)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Confronto tra calculate_angle scalare e joint_angles vettoriale")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((args.frames, 33, 4), dtype=np.float32)
+    triples = list(JOINT_TRIPLES.values())
+
+    expected = scalar_angles(landmarks, triples)
+    vectorized = joint_angles(landmarks, triples)
+    print(f"Differenza massima: {np.max(np.abs(expected - vectorized)):.2e} gradi")
+
+    scalar_time = min(timeit.repeat(lambda: scalar_angles(landmarks, triples), number=1, repeat=args.repeat))
+    vector_time = min(timeit.repeat(lambda: joint_angles(landmarks, triples), number=1, repeat=args.repeat))
+    vector_3d_time = min(timeit.repeat(lambda: joint_angles(landmarks, triples, use_3d=True), number=1, repeat=args.repeat))
+    single = landmarks[:1]
+    single_time = min(timeit.repeat(lambda: joint_angles(single, triples), number=1000, repeat=args.repeat)) / 1000
+    frame_time = min(timeit.repeat(lambda: frame_angles(single[0], triples), number=1000, repeat=args.repeat)) / 1000
+
+    angles = args.frames * len(triples)
+    print(f"{args.frames} frame x {len(triples)} angoli")
+    print(f"scalare:        {scalar_time * 1e3:8.2f} ms ({scalar_time / angles * 1e6:.2f} us/angolo)")
+    print(f"vettoriale 2D:  {vector_time * 1e3:8.2f} ms ({vector_time / angles * 1e6:.3f} us/angolo, "
+          f"{scalar_time / vector_time:.0f}x)")
+    print(f"vettoriale 3D:  {vector_3d_time * 1e3:8.2f} ms")
+    print(f"singolo frame:  {single_time * 1e6:8.1f} us per {len(triples)} angoli "
+          f"(frame_angles {frame_time * 1e6:.1f} us)")
+    print("process_frame, due angoli da un frame di MediaPipe:")
+    single_frame_paths(landmarks[0], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+import database as db
+
+
+# Insert delle versioni precedenti, sullo schema originale della tabella reports
+LEGACY_SAVE_REPORT = "INSERT INTO reports (user_id, timestamp, repetitions, file_path) VALUES (?, ?, ?, ?)"
+
+
+# Scrittura come nelle versioni precedenti: connessione aperta e chiusa a ogni report
+def legacy_write(path, user_id, i):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SAVE_REPORT, (user_id, f"{i:08d}", i, "bench.csv"))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(path, user_id):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(db.SQL_REPORTS, (user_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def pooled_write(path, user_id, i):
+    db.save_report(user_id, f"{i:08d}", i, "bench.csv", path=path)
+
+
+def pooled_read(path, user_id):
+    return db.get_reports(user_id, path=path)
+
+
+MODES = {"legacy": (legacy_write, legacy_read), "pooled": (pooled_write, pooled_read)}
+
+
+# Errore dovuto a un lock del database ("database is locked" / "database is busy")
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+# Processo client: esegue ops operazioni e restituisce latenze ed errori di lock.
+# Ogni altro errore di SQLite (schema, disco, query) interrompe il benchmark.
+def _client(args):
+    mode, role, path, user_id, ops, start_at = args
+    write, read = MODES[mode]
+    while time.time() < start_at:
+        time.sleep(0.001)
+    latencies = []
+    locked = 0
+    for i in range(ops):
+        start = time.perf_counter()
+        try:
+            if role == "writer":
+                write(path, user_id, i)
+            else:
+                read(path, user_id)
+        except sqlite3.OperationalError as exc:
+            # Solo i conflitti di lock contano come errori di concorrenza
+            if not is_lock_error(exc):
+                raise
+            locked += 1
+        latencies.append(time.perf_counter() - start)
+    return role, latencies, locked
+
+
+def run(mode, writers, readers, ops):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+    if mode == "pooled":
+        db.initialize_db(path)
+        db.close_connection(path)
+    else:
+        conn = sqlite3.connect(path)
+        conn.execute('''CREATE TABLE reports (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER,
+                        timestamp TEXT, repetitions INTEGER, file_path TEXT)''')
+        conn.commit()
+        conn.close()
+
+    start_at = time.time() + 1.0
+    jobs = [(mode, "writer", path, n, ops, start_at) for n in range(writers)]
+    jobs += [(mode, "reader", path, n % max(1, writers), ops, start_at) for n in range(readers)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(_client, jobs)
+    elapsed = max(sum(latencies) for _, latencies, _ in results)
+
+    for role in ("writer", "reader"):
+        latencies = sorted(l for r, ls, _ in results if r == role for l in ls)
+        if not latencies:
+            continue
+        locked = sum(lk for r, _, lk in results if r == role)
+        p99 = latencies[int(0.99 * (len(latencies) - 1))]
+        print(f"{mode:7s} {role}: {len(latencies) / elapsed:8.0f} op/s, "
+              f"p99 {p99 * 1e3:7.2f} ms, max {latencies[-1] * 1e3:7.2f} ms, errori di lock {locked}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark di concorrenza su SQLite: N scrittori e M lettori")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=300, help="operazioni per processo")
+    args = parser.parse_args(argv)
+    for mode in MODES:
+        run(mode, args.writers, args.readers, args.ops)
+
+
+if __name__ == "__main__":
+    main()
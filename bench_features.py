@@ -0,0 +1,78 @@
+import argparse
+import math
+import timeit
+
+import numpy as np
+
+from activity_features import DISTANCE_PAIRS, NOSE, NUM_FEATURES, extract_features, frame_features
+from joint_angles import (JOINT_TRIPLES, LEFT_ANKLE, LEFT_HIP, LEFT_SHOULDER, LEFT_WRIST, RIGHT_ANKLE, RIGHT_HIP,
+                          RIGHT_SHOULDER, RIGHT_WRIST)
+
+
+# Versione di riferimento articolazione per articolazione, come il codice di process_frame
+def scalar_features(frame):
+    def point(index):
+        return float(frame[index, 0]), float(frame[index, 1])
+
+    def midpoint(a, b):
+        return (point(a)[0] + point(b)[0]) / 2, (point(a)[1] + point(b)[1]) / 2
+
+    features = []
+    for a, b, c in JOINT_TRIPLES.values():
+        (ax, ay), (bx, by), (cx, cy) = point(a), point(b), point(c)
+        angle = abs((math.atan2(cy - by, cx - bx) - math.atan2(ay - by, ax - bx)) * 180.0 / math.pi)
+        features.append(360 - angle if angle > 180.0 else angle)
+    shoulder, hip, ankle = midpoint(LEFT_SHOULDER, RIGHT_SHOULDER), midpoint(LEFT_HIP, RIGHT_HIP), midpoint(LEFT_ANKLE, RIGHT_ANKLE)
+    torso_x, torso_y = shoulder[0] - hip[0], shoulder[1] - hip[1]
+    torso = max(math.hypot(torso_x, torso_y), 1e-3)
+    features.append(math.degrees(math.atan2(abs(torso_x), -torso_y)))
+    for a, b in DISTANCE_PAIRS:
+        features.append(math.dist(point(a), point(b)) / torso)
+    for top, bottom in ((hip[1], ankle[1]), (shoulder[1], ankle[1]), (point(LEFT_WRIST)[1], shoulder[1]),
+                        (point(RIGHT_WRIST)[1], shoulder[1]), (point(NOSE)[1], ankle[1])):
+        features.append((bottom - top) / torso)
+    return np.array(features, dtype=np.float32)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parità e prestazioni dell'estrazione delle 23 caratteristiche")
+    parser.add_argument("--frames", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((args.frames, 33, 4), dtype=np.float32)
+    # Alcuni frame senza posa, come li registra LandmarkRecorder
+    landmarks[::97] = np.nan
+
+    batch = extract_features(landmarks)
+    stream = np.stack([frame_features(frame) for frame in landmarks])
+    chunked = np.concatenate([extract_features(chunk) for chunk in np.array_split(landmarks, 7)])
+    valid = ~np.isnan(landmarks).any(axis=(1, 2))
+    reference = np.stack([scalar_features(frame) for frame in landmarks[valid]])
+
+    checks = {
+        "batch = frame per frame": np.array_equal(batch, stream, equal_nan=True),
+        "batch = blocchi": np.array_equal(batch, chunked, equal_nan=True),
+        "deterministico": np.array_equal(batch, extract_features(landmarks), equal_nan=True),
+        "frame senza posa = NaN": bool(np.isnan(batch[~valid]).all()),
+        "riferimento scalare": bool(np.allclose(batch[valid], reference, rtol=1e-5, atol=1e-4)),
+    }
+    for name, passed in checks.items():
+        print(f"{name:26s} {'ok' if passed else 'ERRORE'}")
+    print(f"Differenza massima dal riferimento: {np.abs(batch[valid] - reference).max():.2e}")
+
+    scalar_time = min(timeit.repeat(lambda: [scalar_features(frame) for frame in landmarks], number=1, repeat=args.repeat))
+    batch_time = min(timeit.repeat(lambda: extract_features(landmarks), number=1, repeat=args.repeat))
+    single = landmarks[1]
+    single_time = min(timeit.repeat(lambda: frame_features(single), number=1000, repeat=args.repeat)) / 1000
+    print(f"{args.frames} frame x {NUM_FEATURES} caratteristiche")
+    print(f"scalare:        {scalar_time * 1e3:8.2f} ms ({scalar_time / args.frames * 1e6:.1f} us/frame)")
+    print(f"vettoriale:     {batch_time * 1e3:8.2f} ms ({batch_time / args.frames * 1e6:.2f} us/frame, "
+          f"{scalar_time / batch_time:.0f}x)")
+    print(f"singolo frame:  {single_time * 1e6:8.1f} us")
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
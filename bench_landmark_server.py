@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from exercise_recognition import EXERCISE_RULES
+from joint_angles import JOINT_TRIPLES, NUM_LANDMARKS, joint_angles
+from landmark_server import FRAME_BYTES, HEADER, LANDMARK_DTYPE
+
+# Script del server avviato con --spawn, indipendente dalla directory corrente
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "landmark_server.py")
+
+
+# Un ciclo di movimento simulato: l'angolo dell'articolazione dell'esercizio oscilla tra
+# 178° e 60° con il periodo indicato. Restituisce i frame (N, 33, 4) e i loro angoli.
+def simulated_cycle(exercise, fps, period=2.0, seed=0):
+    a, b, c = JOINT_TRIPLES[EXERCISE_RULES[exercise]["joint"]]
+    steps = max(int(round(period * fps)), 1)
+    theta = np.radians(119 + 59 * np.cos(2 * np.pi * np.arange(steps) / steps))
+    frames = np.tile(np.random.default_rng(seed).random((1, NUM_LANDMARKS, 4), dtype=np.float32), (steps, 1, 1))
+    frames[:, :, 3] = 1.0
+    frames[:, b, :2] = (0.5, 0.55)
+    frames[:, a, :2] = (0.5, 0.30)
+    frames[:, c, 0] = 0.5 + 0.2 * np.sin(theta)
+    frames[:, c, 1] = 0.55 - 0.2 * np.cos(theta)
+    return frames, joint_angles(frames, (EXERCISE_RULES[exercise]["joint"],))[:, 0]
+
+
+# Un client simulato: invia frames_per_message frame alla volta a fps frame/s per seconds
+# secondi e raccoglie gli eventi; la latenza di un evento "rep" si misura dall'invio del frame
+async def run_session(host, port, exercise, payloads, expected, fps, seconds, frames_per_message, offset):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(json.dumps({"exercise": exercise}).encode() + b"\n")
+    await reader.readline()
+    messages = int(seconds * fps) // frames_per_message
+    sent_at = np.zeros(messages * frames_per_message)
+    result = {"reps": 0, "feedback": 0, "latencies": [], "lag": 0.0, "summary": None}
+
+    async def read_events():
+        async for line in reader:
+            event = json.loads(line)
+            if event["event"] == "summary":
+                result["summary"] = event
+                return
+            if event["event"] == "rep":
+                result["reps"] += 1
+                result["latencies"].append(time.perf_counter() - sent_at[event["frame"]])
+            elif event["event"] == "feedback":
+                result["feedback"] += 1
+
+    events = asyncio.create_task(read_events())
+    start = time.perf_counter() + offset
+    interval = frames_per_message / fps
+    for index in range(messages):
+        delay = start + index * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            result["lag"] = max(result["lag"], -delay)
+        first = index * frames_per_message
+        sent_at[first:first + frames_per_message] = time.perf_counter()
+        writer.write(payloads[index % len(payloads)])
+        await writer.drain()
+    writer.write(HEADER.pack(0))
+    await writer.drain()
+    await events
+    writer.close()
+    result["correct"] = result["summary"] is not None and result["summary"]["repetitions"] == expected(messages * frames_per_message)
+    return result
+
+
+# Processo di carico: sessions client simultanei nello stesso event loop
+def run_clients(host, port, sessions, exercise, fps, seconds, frames_per_message, seed):
+    frames, angles = simulated_cycle(exercise, fps)
+    # Un ciclo intero di messaggi già serializzati (il ciclo è ripetuto fino alla durata richiesta)
+    repeats = math.lcm(len(frames), frames_per_message) // len(frames)
+    cycle = np.concatenate([frames] * repeats).astype(LANDMARK_DTYPE)
+    payloads = [HEADER.pack(FRAME_BYTES * frames_per_message) + cycle[i:i + frames_per_message].tobytes()
+                for i in range(0, len(cycle), frames_per_message)]
+    below = angles < EXERCISE_RULES[exercise]["rep_below"]
+
+    def expected(total):
+        return int(below.sum() * (total // len(below)) + below[:total % len(below)].sum())
+
+    rng = random.Random(seed)
+
+    async def run_all():
+        return await asyncio.gather(*(run_session(host, port, exercise, payloads, expected, fps, seconds,
+                                                  frames_per_message, rng.random() * frames_per_message / fps)
+                                      for _ in range(sessions)), return_exceptions=True)
+    return asyncio.run(run_all())
+
+
+async def _server_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"stats": true}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+def _wait_for_server(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("il server è terminato durante l'avvio")
+        try:
+            return asyncio.run(_server_stats(host, port))
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("il server non risponde")
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)] if values else float("nan")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carico simulato sul server dei landmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions", type=int, default=300, help="sessioni simultanee")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame al secondo per sessione")
+    parser.add_argument("--seconds", type=float, default=10.0, help="durata di ogni sessione")
+    parser.add_argument("--frames-per-message", type=int, default=1)
+    parser.add_argument("--exercise", choices=sorted(EXERCISE_RULES), default="Squat")
+    parser.add_argument("-p", "--processes", type=int, default=2, help="processi che generano il carico")
+    parser.add_argument("--spawn", action="store_true", help="avvia il server in un processo separato")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.spawn:
+        process = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--host", args.host,
+                                    "--port", str(args.port)])
+        _wait_for_server(args.host, args.port, process)
+    try:
+        before = asyncio.run(_server_stats(args.host, args.port))
+        shares = [args.sessions // args.processes + (i < args.sessions % args.processes) for i in range(args.processes)]
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            futures = [executor.submit(run_clients, args.host, args.port, share, args.exercise, args.fps, args.seconds,
+                                       args.frames_per_message, seed) for seed, share in enumerate(shares) if share]
+            results = [result for future in futures for result in future.result()]
+        elapsed = time.perf_counter() - start
+        after = asyncio.run(_server_stats(args.host, args.port))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    results = [result for result in results if not isinstance(result, BaseException)]
+    correct = sum(1 for result in results if result["correct"])
+    latencies = [latency for result in results for latency in result["latencies"]]
+    frames = after["frames"] - before["frames"]
+    cpu = after["cpu_seconds"] - before["cpu_seconds"]
+    # Frazione di un core usata dal server mentre il carico era attivo
+    utilization = cpu / elapsed
+
+    print(f"{args.sessions} sessioni x {args.fps:g} fps per {args.seconds:g} s "
+          f"({args.frames_per_message} frame per messaggio, {args.processes} processi di carico)")
+    print(f"sessioni corrette {correct}/{args.sessions}, errori di connessione {len(errors)}")
+    print(f"frame elaborati {frames} in {elapsed:.2f} s: {frames / elapsed:.0f} frame/s "
+          f"(richiesti {args.sessions * args.fps:.0f} frame/s)")
+    print(f"CPU del server {cpu:.2f} s ({utilization * 100:.0f}% di un core, "
+          f"{cpu / frames * 1e6 if frames else float('nan'):.1f} us/frame)")
+    if utilization > 0:
+        print(f"stima: {args.sessions / utilization:.0f} sessioni a {args.fps:g} fps per core")
+    if latencies:
+        print(f"latenza eventi rep: p50 {_percentile(latencies, 0.5) * 1e3:.2f} ms, p95 {_percentile(latencies, 0.95) * 1e3:.2f} ms, "
+              f"p99 {_percentile(latencies, 0.99) * 1e3:.2f} ms")
+    print(f"ritardo massimo di invio dei client: {max((r['lag'] for r in results), default=0) * 1e3:.1f} ms")
+    print(f"eventi: {sum(r['reps'] for r in results)} rep, {sum(r['feedback'] for r in results)} feedback")
+    return 0 if correct == args.sessions and not errors else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+import argparse
+import os
+import tempfile
+
+from multi_camera import MultiCamera
+
+
+# Scalabilità della modalità multi-camera: lo stesso video ripetuto come N telecamere finte,
+# senza anteprima né limite di velocità. L'efficienza confronta il throughput totale con
+# N volte quello di una sola sorgente (1.0 = crescita lineare).
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput della modalità multi-camera al crescere delle sorgenti")
+    parser.add_argument("video", help="video usato come telecamera finta (ripetuto in loop)")
+    parser.add_argument("--max-streams", type=int, default=os.cpu_count())
+    parser.add_argument("--seconds", type=float, default=20.0, help="durata di ogni prova")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} core disponibili")
+    baseline = None
+    with tempfile.TemporaryDirectory() as output_dir:
+        for streams in range(1, args.max_streams + 1):
+            multi = MultiCamera([args.video] * streams, {"model_complexity": args.model_complexity}, loop=True,
+                                pace=False, display=False, output_dir=output_dir)
+            summary = multi.run(args.seconds)
+            errors = [stream["error"] for stream in summary if stream["error"]]
+            if errors:
+                print(f"{streams} sorgenti: errori {errors}")
+                return 1
+            total = sum(stream["fps"] for stream in summary)
+            baseline = baseline or total
+            print(f"{streams} sorgenti: {total:7.1f} fps totali, {total / streams:6.1f} fps per sorgente, "
+                  f"efficienza {total / (baseline * streams):.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
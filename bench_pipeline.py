@@ -0,0 +1,375 @@
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Stadi misurati per frame. decode è la lettura del frame, gli altri sono le chiamate
+# fatte da process_frame: cvtColor e pose.process (detect_pose), rules (angoli, conteggio),
+# drawing (scheletro e testo), recording (conversione e registrazione dei landmark, righe CSV,
+# campioni nel database)
+STAGES = ("decode", "cvtColor", "pose", "rules", "drawing", "recording")
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_VIDEOS = "Videos"
+
+# Video sintetico: sfondo fisso e una sagoma che sale e scende, generati dal seme
+SYNTHETIC_SIZE = (640, 480)
+SYNTHETIC_FPS = 30
+
+# Clip versionata con una persona disegnata (synthetic_subject.write_squat_clip, 2 s):
+# MediaPipe la rileva, quindi misura anche il modello dei landmark anche senza Videos/.
+# L'hash fissa l'input della baseline; se la clip cambia va rigenerata anche la baseline.
+SUBJECT_VIDEO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data", "squat_sintetico.avi")
+SUBJECT_SHA256 = "59d27099abc5e22473ebc25d9788ddde7a4d88b69fba438338801b727f72b00b"
+
+
+# Somma il tempo delle chiamate di ogni stadio nel frame corrente
+class StageTimer:
+    def __init__(self):
+        self.current = dict.fromkeys(STAGES, 0.0)
+
+    def wrap(self, stage, func):
+        current = self.current
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                current[stage] += time.perf_counter() - start
+        return timed
+
+    def take(self):
+        values = dict(self.current)
+        for stage in self.current:
+            self.current[stage] = 0.0
+        return values
+
+
+# Oggetto Pose per process_frame con il solo metodo process (nessun process_bgr)
+class _StagePose:
+    def __init__(self, process):
+        self.process = process
+
+
+# Pose che esegue l'inferenza vera ma restituisce landmark di un ciclo di squat simulato:
+# sul video sintetico nessuna posa viene rilevata, così anche regole, disegno e
+# registrazione vengono misurati su ogni frame
+def _replay_pose(pose):
+    from bench_landmark_server import simulated_cycle
+    from pose_analysis import PoseResult, landmarks_from_array
+
+    cycle = [PoseResult(landmarks_from_array(frame)) for frame in simulated_cycle("Squat", SYNTHETIC_FPS)[0]]
+    counter = iter(range(sys.maxsize))
+
+    def process(rgb_frame):
+        pose.process(rgb_frame)
+        return cycle[next(counter) % len(cycle)]
+    return process
+
+
+def write_synthetic_video(path, frames, size=SYNTHETIC_SIZE, fps=SYNTHETIC_FPS, seed=0):
+    import cv2
+
+    width, height = size
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for index in range(frames):
+        frame = background.copy()
+        drop = int(height * 0.12 * (1 - math.cos(2 * math.pi * index / (2 * fps))))
+        cv2.circle(frame, (width // 2, height // 4 + drop), 30, (170, 190, 220), -1)
+        cv2.rectangle(frame, (width // 2 - 40, height // 4 + 35 + drop), (width // 2 + 40, height // 2 + 60 + drop),
+                      (90, 60, 40), -1)
+        cv2.rectangle(frame, (width // 2 - 40, height // 2 + 60 + drop), (width // 2 + 40, height - 20),
+                      (40, 40, 90), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def file_digest(path, length=16):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+# Picco della memoria residente del processo in MB (None dove il modulo resource manca)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux riporta kB, macOS byte
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _summary_ms(values):
+    values = np.asarray(values) * 1e3
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(values.max())}
+
+
+# Un caso del benchmark, eseguito in un processo nuovo (il picco di RSS è solo suo).
+# Percorre il video come analyze_video: lettura, process_frame con LandmarkRecorder,
+# SessionWriter e SampleRecorder, poi chiusura dei file (save). I video più corti dei
+# frame richiesti ricominciano da capo.
+def run_case(case):
+    import cv2
+    import database as db
+    import pose_analysis
+    from landmark_store import LandmarkRecorder
+
+    timer = StageTimer()
+    cv2.cvtColor = timer.wrap("cvtColor", cv2.cvtColor)
+    cv2.putText = timer.wrap("drawing", cv2.putText)
+    pose_analysis.mp_drawing.draw_landmarks = timer.wrap("drawing", pose_analysis.mp_drawing.draw_landmarks)
+    for name in ("frame_angles", "count_repetition"):
+        setattr(pose_analysis, name, timer.wrap("rules", getattr(pose_analysis, name)))
+    pose_analysis.landmarks_to_array = timer.wrap("recording", pose_analysis.landmarks_to_array)
+
+    mediapipe_pose = pose_analysis.mp_pose.Pose(**case["pose_config"])
+    process = _replay_pose(mediapipe_pose) if case["replay"] else mediapipe_pose.process
+    pose = _StagePose(timer.wrap("pose", process))
+
+    database = os.path.join(case["workdir"], f"{case['name']}.db")
+    db.initialize_db(database)
+    data = pose_analysis.open_session_writer(case["workdir"], suffix=case["name"])
+    recorder = LandmarkRecorder()
+    samples = db.SampleRecorder(1, path=database)
+    data.append = timer.wrap("recording", data.append)
+    recorder.append = timer.wrap("recording", recorder.append)
+    samples.record = timer.wrap("recording", samples.record)
+
+    cap = cv2.VideoCapture(case["path"])
+    rep_count = 0
+    latencies = []
+    stages = []
+    detected = 0
+    start = None
+    for index in range(case["warmup"] + case["frames"]):
+        if index == case["warmup"]:
+            start = time.perf_counter()
+        frame_start = time.perf_counter()
+        ret, frame = cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read()
+            if not ret:
+                break
+        decode = time.perf_counter() - frame_start
+        rows = len(data)
+        frame, rep_count, data = pose_analysis.process_frame(frame, rep_count, data, pose, recorder=recorder,
+                                                             samples=samples)
+        latency = time.perf_counter() - frame_start
+        frame_stages = timer.take()
+        frame_stages["decode"] = decode
+        if index >= case["warmup"]:
+            latencies.append(latency)
+            stages.append(frame_stages)
+            detected += len(data) > rows
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    cap.release()
+
+    save_start = time.perf_counter()
+    filepath = data.close()
+    pose_analysis.save_landmarks(recorder, filepath)
+    samples.close()
+    save = time.perf_counter() - save_start
+    mediapipe_pose.close()
+
+    if not latencies:
+        raise ValueError(f"Nessun frame letto da {case['path']}")
+    stage_ms = {stage: _summary_ms([row[stage] for row in stages]) for stage in STAGES}
+    other = [latency - sum(row.values()) for latency, row in zip(latencies, stages)]
+    return {"input": {"path": case["path"], "sha256": case["sha256"], "replay": case["replay"]},
+            "frames": len(latencies), "fps": len(latencies) / elapsed, "pose_frames": detected / len(latencies),
+            "repetitions": rep_count, "latency_ms": _summary_ms(latencies),
+            "stages_ms": {stage: {"mean": values["mean"], "p95": values["p95"]} for stage, values in stage_ms.items()},
+            "other_ms": float(np.mean(other)) * 1e3, "save_ms": save * 1e3, "peak_rss_mb": peak_rss_mb()}
+
+
+# Ogni ripetizione in un processo nuovo; si tiene quella con gli fps mediani
+def run_isolated(case, repeat):
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            runs.append(executor.submit(run_case, case).result())
+    runs.sort(key=lambda run: run["fps"])
+    return runs[len(runs) // 2]
+
+
+def environment(pose_config):
+    import cv2
+    import mediapipe
+
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpu_count": os.cpu_count(), "numpy": np.__version__, "opencv": cv2.__version__,
+            "opencv_threads": cv2.getNumThreads(), "mediapipe": mediapipe.__version__, "pose_config": pose_config}
+
+
+# Metriche confrontate con la baseline: (nome, valore, True se un valore più alto è migliore)
+def compared_metrics(result):
+    yield "fps", result["fps"], True
+    yield "latency_ms.p50", result["latency_ms"]["p50"], False
+    yield "latency_ms.p95", result["latency_ms"]["p95"], False
+    for stage, values in result["stages_ms"].items():
+        yield f"stages_ms.{stage}.mean", values["mean"], False
+    yield "save_ms", result["save_ms"], False
+    yield "peak_rss_mb", result["peak_rss_mb"], False
+
+
+# Confronto con la baseline: una metrica regredisce se peggiora oltre tolerance (relativa)
+# e oltre una soglia assoluta (min_ms per i tempi, min_rss_mb per la memoria), così le
+# variazioni di stadi da pochi microsecondi non fanno fallire il controllo. Un caso della
+# baseline assente dai risultati conta come regressione: non è stato misurato affatto.
+def compare(results, baseline, tolerance=0.15, min_ms=0.05, min_rss_mb=10.0):
+    rows = []
+    for name in baseline["cases"]:
+        if name not in results["cases"]:
+            rows.append({"case": name, "metric": "caso mancante", "baseline": None, "current": None, "change": None,
+                         "regression": True})
+    for name, result in results["cases"].items():
+        reference = baseline["cases"].get(name)
+        if reference is None:
+            continue
+        if reference["input"]["sha256"] != result["input"]["sha256"]:
+            print(f"{name}: input diverso dalla baseline, confronto saltato")
+            continue
+        old_metrics = {metric: value for metric, value, _ in compared_metrics(reference)}
+        for metric, new, higher_is_better in compared_metrics(result):
+            old = old_metrics.get(metric)
+            if old is None or new is None or old == 0:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            floor = min_rss_mb if metric == "peak_rss_mb" else 0.0 if metric == "fps" else min_ms
+            regression = worse > tolerance and abs(new - old) >= floor
+            rows.append({"case": name, "metric": metric, "baseline": old, "current": new, "change": change,
+                         "regression": regression})
+    return rows
+
+
+def print_results(results):
+    for name, result in results["cases"].items():
+        latency = result["latency_ms"]
+        rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/d"
+        print(f"\n{name}: {result['frames']} frame, {result['fps']:.1f} fps, latenza p50 {latency['p50']:.2f} ms, "
+              f"p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, picco RSS {rss}")
+        for stage, values in result["stages_ms"].items():
+            print(f"  {stage:10s} {values['mean']:8.3f} ms (p95 {values['p95']:.3f} ms)")
+        print(f"  {'altro':10s} {result['other_ms']:8.3f} ms")
+        print(f"  {'save':10s} {result['save_ms']:8.1f} ms a fine sessione")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark riproducibile della pipeline di analisi (process_frame)")
+    parser.add_argument("videos", nargs="*", default=None,
+                        help=f"video, cartelle o pattern glob dei video di esempio (default: {DEFAULT_VIDEOS}/)")
+    parser.add_argument("--frames", type=int, default=300, help="frame misurati per caso")
+    parser.add_argument("--warmup", type=int, default=20, help="frame iniziali esclusi dalle misure")
+    parser.add_argument("--repeat", type=int, default=3, help="ripetizioni per caso (vale quella mediana)")
+    parser.add_argument("--no-synthetic", action="store_true", help="salta il video sintetico")
+    parser.add_argument("--no-subject", action="store_true", help="salta la clip con la persona disegnata")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="salva i risultati come nuova baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="peggioramento relativo tollerato")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="differenza minima (ms) per una regressione")
+    parser.add_argument("--min-rss-mb", type=float, default=10.0, help="differenza minima (MB) per una regressione")
+    args = parser.parse_args(argv)
+
+    from batch_analysis import collect_videos
+
+    pose_config = {"model_complexity": args.model_complexity}
+    inputs = args.videos or ([DEFAULT_VIDEOS] if os.path.isdir(DEFAULT_VIDEOS) else [])
+    videos = collect_videos(inputs)
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(pose_config),
+               "settings": {"frames": args.frames, "warmup": args.warmup, "repeat": args.repeat}, "cases": {}}
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+        cases = []
+        if not args.no_synthetic:
+            path = write_synthetic_video(os.path.join(workdir, "synthetic.avi"), 2 * SYNTHETIC_FPS * 5)
+            cases.append(("synthetic", path, True))
+        if not args.no_subject:
+            if not os.path.exists(SUBJECT_VIDEO) or file_digest(SUBJECT_VIDEO, None) != SUBJECT_SHA256:
+                parser.error(f"{SUBJECT_VIDEO} mancante o diverso dalla versione attesa (sha256 {SUBJECT_SHA256})")
+            cases.append(("subject", SUBJECT_VIDEO, False))
+        for video in videos:
+            cases.append((f"video:{os.path.basename(video)}", video, False))
+        if not cases:
+            parser.error("nessun video da misurare")
+
+        for name, path, replay in cases:
+            print(f"Caso {name}...")
+            case = {"name": name.replace(":", "_").replace(".", "_"), "path": path, "replay": replay,
+                    "frames": args.frames, "warmup": args.warmup, "pose_config": pose_config, "workdir": workdir,
+                    "sha256": file_digest(path)}
+            results["cases"][name] = run_isolated(case, args.repeat)
+
+    print_results(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nRisultati salvati in {args.output}")
+
+    # Il video sintetico usa landmark simulati: senza un video in cui MediaPipe trova una
+    # posa il modello dei landmark e le regole sui dati reali non sono stati misurati
+    unmeasured = not any(not result["input"]["replay"] and result["pose_frames"] > 0
+                         for result in results["cases"].values())
+    if unmeasured:
+        print("Errore: nessun video reale con pose rilevate, il modello dei landmark non è stato misurato")
+
+    if args.update_baseline:
+        if unmeasured:
+            print("Baseline non aggiornata")
+            return 1
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline aggiornata: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"Nessuna baseline in {args.baseline}: usare --update-baseline per crearla")
+        return 1 if unmeasured else 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    for key in ("cpu_count", "machine", "opencv", "mediapipe", "pose_config"):
+        if baseline["environment"].get(key) != results["environment"][key]:
+            print(f"Attenzione: {key} diverso dalla baseline ({baseline['environment'].get(key)} -> "
+                  f"{results['environment'][key]})")
+    rows = compare(results, baseline, args.tolerance, args.min_ms, args.min_rss_mb)
+    regressions = [row for row in rows if row["regression"]]
+    print(f"\nConfronto con {args.baseline} (tolleranza {args.tolerance:.0%}):")
+    for row in rows:
+        mark = "REGRESSIONE" if row["regression"] else ""
+        if row["change"] is None:
+            print(f"  {row['case']:24s} {row['metric']:24s} {mark}")
+            continue
+        print(f"  {row['case']:24s} {row['metric']:24s} {row['baseline']:10.3f} -> {row['current']:10.3f} "
+              f"({row['change']:+.1%}) {mark}")
+    if regressions:
+        print(f"{len(regressions)} regressioni")
+        return 1
+    print("Nessuna regressione")
+    return 1 if unmeasured else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
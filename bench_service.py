@@ -0,0 +1,119 @@
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _request(url, data=None, headers=None):
+    request = urllib.request.Request(url, data=data, headers=headers or {}, method="POST" if data is not None else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.read()
+
+
+# Un client: carica il video e interroga lo stato finché il lavoro non è terminato
+def run_client(base_url, video, poll):
+    with open(video, "rb") as f:
+        data = f.read()
+    start = time.perf_counter()
+    status, body = _request(f"{base_url}/jobs", data, {"X-Filename": os.path.basename(video),
+                                                       "Content-Type": "application/octet-stream"})
+    accepted = time.perf_counter() - start
+    if status != 202:
+        return {"status": status, "upload": accepted}
+    job_id = json.loads(body)["id"]
+    while True:
+        time.sleep(poll)
+        job = json.loads(_request(f"{base_url}/jobs/{job_id}")[1])
+        if job["status"] in ("done", "failed"):
+            break
+    result = {"status": status, "upload": accepted, "latency": time.perf_counter() - start, "job": job}
+    if job["status"] == "done":
+        result["result_bytes"] = len(_request(f"{base_url}/jobs/{job_id}/result")[1])
+    return result
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)] if values else float("nan")
+
+
+# Attende che il servizio avviato da --spawn risponda
+def _wait_for_service(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("il servizio è terminato durante l'avvio")
+        try:
+            _request(f"{base_url}/metrics")
+            return
+        except urllib.error.URLError:
+            time.sleep(0.2)
+    raise TimeoutError("il servizio non risponde")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test di carico del servizio di analisi su localhost")
+    parser.add_argument("video", help="video da caricare in ogni richiesta")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("-n", "--requests", type=int, default=20, help="numero di upload")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="client simultanei")
+    parser.add_argument("--poll", type=float, default=0.2, help="intervallo di interrogazione dello stato (s)")
+    parser.add_argument("--spawn", action="store_true", help="avvia un'istanza del servizio su un database temporaneo")
+    parser.add_argument("--workers", type=int, default=2, help="processi del servizio avviato con --spawn")
+    parser.add_argument("--max-pending", type=int, default=8, help="limite della coda del servizio avviato con --spawn")
+    args = parser.parse_args(argv)
+
+    process = None
+    if args.spawn:
+        import tempfile
+        workdir = tempfile.mkdtemp(prefix="bench_service_")
+        port = args.url.rsplit(":", 1)[1]
+        process = subprocess.Popen([sys.executable, os.path.abspath("analysis_service.py"), "--port", port,
+                                    "-j", str(args.workers), "--max-pending", str(args.max_pending),
+                                    "--database", os.path.join(workdir, "service.db"),
+                                    "--upload-dir", os.path.join(workdir, "uploads"),
+                                    "--result-dir", os.path.join(workdir, "results")])
+        _wait_for_service(args.url, process)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda _: run_client(args.url, args.video, args.poll), range(args.requests)))
+        elapsed = time.perf_counter() - start
+        metrics = json.loads(_request(f"{args.url}/metrics")[1])
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    done = [r for r in results if r.get("job", {}).get("status") == "done"]
+    failed = [r for r in results if r.get("job", {}).get("status") == "failed"]
+    rejected = [r for r in results if r["status"] == 503]
+    uploads = [r["upload"] for r in results]
+    latencies = [r["latency"] for r in done]
+    queue_waits = [r["job"]["queue_seconds"] for r in done]
+    runs = [r["job"]["run_seconds"] for r in done]
+
+    print(f"{args.requests} upload, {args.concurrency} client simultanei in {elapsed:.2f} s")
+    print(f"completati {len(done)}, falliti {len(failed)}, rifiutati 503 {len(rejected)}, "
+          f"altri errori {len(results) - len(done) - len(failed) - len(rejected)}")
+    print(f"throughput: {len(done) / elapsed:.2f} lavori/s")
+    for name, values in (("upload", uploads), ("attesa in coda", queue_waits), ("analisi", runs), ("latenza totale", latencies)):
+        if values:
+            print(f"{name:15s} p50 {_percentile(values, 0.5) * 1e3:8.1f} ms   p95 {_percentile(values, 0.95) * 1e3:8.1f} ms   "
+                  f"max {max(values) * 1e3:8.1f} ms")
+    print("metriche del servizio:", json.dumps(metrics, indent=2))
+    return 0 if not failed and len(done) + len(rejected) == len(results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
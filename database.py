@@ -0,0 +1,310 @@
+import queue
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+# Costante per il database
+DATABASE = "palestra_ai.db"
+
+# Impostazioni applicate a ogni connessione: WAL permette letture concorrenti a una
+# scrittura, synchronous=NORMAL è sicuro con WAL e riduce le fsync
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Versione dello schema (PRAGMA user_version): le migrazioni dei dati delle versioni
+# precedenti vengono eseguite una sola volta, non a ogni avvio
+SCHEMA_VERSION = 1
+
+# Istruzioni SQL riusate: stesso testo = stesso statement preparato nella cache della connessione
+SQL_LOGIN = "SELECT * FROM users WHERE email = ? AND password = ?"
+SQL_REGISTER = ("INSERT INTO users (email, password, name, surname, dob, height, weight, femur_length, tibia_length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_SAVE_REPORT = ("INSERT INTO reports (user_id, timestamp, repetitions, file_path, session_id) "
+                   "VALUES (?, ?, ?, ?, ?)")
+SQL_REPORTS = "SELECT timestamp, repetitions, file_path FROM reports WHERE user_id = ?"
+SQL_INSERT_SAMPLES = ("INSERT OR REPLACE INTO session_samples "
+                      "(user_id, session_id, frame, timestamp, repetitions, back_thigh_angle, knee_angle) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)")
+SQL_SESSION_STATS = ("SELECT COUNT(*), MAX(repetitions), MIN(back_thigh_angle), MAX(back_thigh_angle), "
+                     "MIN(frame), MAX(frame) FROM session_samples WHERE user_id = ? AND session_id = ?")
+SQL_SAMPLE_TIMESTAMP = "SELECT timestamp FROM session_samples WHERE user_id = ? AND session_id = ? AND frame = ?"
+SQL_SAVE_SUMMARY = ("INSERT OR REPLACE INTO session_summaries (user_id, timestamp, report_id, session_id, file_path, "
+                    "repetitions, frames, duration, min_angle, max_angle, avg_tempo) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+SQL_MISSING_SUMMARIES = ("SELECT id, user_id, timestamp, repetitions, file_path, session_id FROM reports "
+                         "WHERE id NOT IN (SELECT report_id FROM session_summaries)")
+SQL_SUMMARY_COLUMNS = ("SELECT timestamp, report_id, repetitions, duration, min_angle, max_angle, avg_tempo, "
+                       "file_path FROM session_summaries ")
+# Paginazione per chiave (timestamp, report_id): ogni pagina è una scansione di intervallo
+# sull'indice, senza OFFSET, quindi costa uguale alla prima e alla millesima pagina
+SQL_FIRST_PAGE = SQL_SUMMARY_COLUMNS + "WHERE user_id = ? ORDER BY timestamp DESC, report_id DESC LIMIT ?"
+SQL_NEXT_PAGE = (SQL_SUMMARY_COLUMNS + "WHERE user_id = ? AND (timestamp, report_id) < (?, ?) "
+                 "ORDER BY timestamp DESC, report_id DESC LIMIT ?")
+SQL_USER_SAMPLES = ("SELECT session_id, frame, timestamp, repetitions, back_thigh_angle, knee_angle "
+                    "FROM session_samples WHERE user_id = ? ORDER BY session_id, frame")
+
+# Connessioni persistenti, una per thread e per file di database
+_local = threading.local()
+
+
+# Restituisce la connessione del thread corrente, creandola alla prima richiesta
+def get_connection(path=DATABASE):
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(path)
+    if conn is None:
+        # isolation_level=None: le transazioni sono gestite esplicitamente da transaction()
+        conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, cached_statements=256)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[path] = conn
+    return conn
+
+
+def close_connection(path=DATABASE):
+    conn = _local.__dict__.setdefault("connections", {}).pop(path, None)
+    if conn is not None:
+        conn.close()
+
+
+# Transazione di scrittura: BEGIN IMMEDIATE prende subito il lock di scrittura, evitando
+# l'errore "database is locked" quando una lettura prova a diventare scrittura.
+# Le transazioni annidate confluiscono in quella più esterna.
+@contextmanager
+def transaction(path=DATABASE):
+    conn = get_connection(path)
+    depths = _local.__dict__.setdefault("depths", {})
+    depth = depths.get(path, 0)
+    if depth:
+        depths[path] = depth + 1
+        try:
+            yield conn
+        finally:
+            depths[path] = depth
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    depths[path] = 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        depths[path] = 0
+
+
+# Inserisce molte righe con una sola istruzione preparata e una sola transazione
+def insert_many(sql, rows, path=DATABASE):
+    with transaction(path) as conn:
+        conn.executemany(sql, rows)
+
+
+# Aggiunge una colonna a una tabella esistente se manca (database creati da versioni precedenti)
+def _ensure_column(conn, table, column, definition):
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# Creazione del database e delle tabelle
+def initialize_db(path=DATABASE):
+    with transaction(path) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            email TEXT UNIQUE,
+                            password TEXT,
+                            name TEXT,
+                            surname TEXT,
+                            dob TEXT,
+                            height REAL,
+                            weight REAL,
+                            femur_length REAL,
+                            tibia_length REAL
+                        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS reports (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            user_id INTEGER,
+                            timestamp TEXT,
+                            repetitions INTEGER,
+                            file_path TEXT,
+                            FOREIGN KEY(user_id) REFERENCES users(id)
+                        )''')
+        _ensure_column(conn, "reports", "repetitions", "INTEGER")
+        _ensure_column(conn, "reports", "session_id", "TEXT")
+        # Serie per frame delle sessioni, ordinata fisicamente per (utente, sessione, frame):
+        # lo storico di un utente si legge con una sola scansione della chiave primaria
+        conn.execute('''CREATE TABLE IF NOT EXISTS session_samples (
+                            user_id INTEGER NOT NULL,
+                            session_id TEXT NOT NULL,
+                            frame INTEGER NOT NULL,
+                            timestamp TEXT,
+                            repetitions INTEGER,
+                            back_thigh_angle REAL,
+                            knee_angle REAL,
+                            PRIMARY KEY (user_id, session_id, frame)
+                        ) WITHOUT ROWID''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_reports_user_timestamp ON reports (user_id, timestamp)")
+        # Riepilogo materializzato di ogni report, aggiornato a ogni salvataggio: lo storico
+        # di un utente si legge a pagine da qui senza toccare i campioni per frame
+        conn.execute('''CREATE TABLE IF NOT EXISTS session_summaries (
+                            user_id INTEGER NOT NULL,
+                            timestamp TEXT NOT NULL,
+                            report_id INTEGER NOT NULL,
+                            session_id TEXT,
+                            file_path TEXT,
+                            repetitions INTEGER,
+                            frames INTEGER,
+                            duration REAL,
+                            min_angle REAL,
+                            max_angle REAL,
+                            avg_tempo REAL,
+                            PRIMARY KEY (user_id, timestamp, report_id)
+                        ) WITHOUT ROWID''')
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # Riepiloghi dei report salvati prima di session_summaries
+            for report in conn.execute(SQL_MISSING_SUMMARIES).fetchall():
+                _save_summary(conn, *report)
+        if version < SCHEMA_VERSION:
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+# Funzione per effettuare il login
+def login_user(email, password, path=DATABASE):
+    return get_connection(path).execute(SQL_LOGIN, (email, password)).fetchone()
+
+
+# Funzione per registrare un nuovo utente: False se l'email è già registrata
+def register_user(email, password, name, surname, dob, height, weight, femur_length, tibia_length, path=DATABASE):
+    try:
+        with transaction(path) as conn:
+            conn.execute(SQL_REGISTER, (email, password, name, surname, dob, height, weight, femur_length, tibia_length))
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+# Secondi dall'inizio del giorno di un orario HH:MM:SS (None se assente o non valido)
+def _seconds(clock):
+    try:
+        hours, minutes, seconds = (int(part) for part in clock.split(":"))
+    except (AttributeError, ValueError):
+        return None
+    return hours * 3600 + minutes * 60 + seconds
+
+
+# Calcola e salva il riepilogo di un report. Legge solo i campioni della sua sessione
+# (un intervallo della chiave primaria di session_samples), mai lo storico dell'utente.
+def _save_summary(conn, report_id, user_id, timestamp, repetitions, file_path, session_id):
+    frames = duration = min_angle = max_angle = avg_tempo = None
+    if session_id is not None:
+        frames, max_reps, min_angle, max_angle, first, last = conn.execute(SQL_SESSION_STATS, (user_id, session_id)).fetchone()
+        if frames:
+            repetitions = repetitions if repetitions is not None else max_reps
+            start = _seconds(conn.execute(SQL_SAMPLE_TIMESTAMP, (user_id, session_id, first)).fetchone()[0])
+            end = _seconds(conn.execute(SQL_SAMPLE_TIMESTAMP, (user_id, session_id, last)).fetchone()[0])
+            if start is not None and end is not None:
+                # Gli orari non hanno la data: una sessione a cavallo della mezzanotte torna indietro
+                duration = (end - start) % 86400
+                avg_tempo = duration / repetitions if repetitions else None
+    conn.execute(SQL_SAVE_SUMMARY, (user_id, timestamp, report_id, session_id, file_path, repetitions,
+                                    frames, duration, min_angle, max_angle, avg_tempo))
+
+
+# Registra il report di una sessione e, nella stessa transazione, il suo riepilogo
+def save_report(user_id, timestamp, repetitions, file_path, session_id=None, path=DATABASE):
+    with transaction(path) as conn:
+        cursor = conn.execute(SQL_SAVE_REPORT, (user_id, timestamp, repetitions, file_path, session_id))
+        _save_summary(conn, cursor.lastrowid, user_id, timestamp, repetitions, file_path, session_id)
+
+
+# Report di un utente come lista di (timestamp, ripetizioni, file)
+def get_reports(user_id, path=DATABASE):
+    return get_connection(path).execute(SQL_REPORTS, (user_id,)).fetchall()
+
+
+# Una pagina di riepiloghi, dal più recente. Le righe sono (timestamp, report_id, ripetizioni,
+# durata s, angolo min, angolo max, tempo medio s/ripetizione, file); cursor è None per la
+# prima pagina, poi il valore restituito come next_cursor (None quando non ci sono altre pagine).
+def get_report_page(user_id, limit=20, cursor=None, path=DATABASE):
+    conn = get_connection(path)
+    if cursor is None:
+        rows = conn.execute(SQL_FIRST_PAGE, (user_id, limit + 1)).fetchall()
+    else:
+        rows = conn.execute(SQL_NEXT_PAGE, (user_id, cursor[0], cursor[1], limit + 1)).fetchall()
+    next_cursor = (rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+# Identificativo di sessione: inizia con data e ora, quindi l'ordine alfabetico è cronologico
+def new_session_id():
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+# Tutti i campioni di un utente, sessione per sessione, in ordine cronologico
+def get_user_samples(user_id, path=DATABASE):
+    return get_connection(path).execute(SQL_USER_SAMPLES, (user_id,)).fetchall()
+
+
+# Segnale di chiusura per il thread di SampleRecorder
+_CLOSE = object()
+
+
+# Registra la serie per frame di una sessione in session_samples. I campioni vengono
+# raccolti in blocchi da batch_size e inseriti con executemany in una transazione da
+# un thread in background, così il ciclo dei frame non attende il database.
+class SampleRecorder:
+    def __init__(self, user_id, session_id=None, batch_size=500, path=DATABASE):
+        self.user_id = user_id
+        self.session_id = session_id or new_session_id()
+        self.batch_size = batch_size
+        self.path = path
+        self.frame = 0
+        self.samples = 0
+        self._batch = []
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="campioni-sessione", daemon=True)
+        self._thread.start()
+
+    # Da chiamare a ogni frame; i frame senza posa avanzano solo il contatore
+    def record(self, timestamp, repetitions, back_thigh_angle, knee_angle=None):
+        if back_thigh_angle is not None:
+            self._batch.append((self.user_id, self.session_id, self.frame, timestamp, repetitions,
+                                float(back_thigh_angle), None if knee_angle is None else float(knee_angle)))
+            self.samples += 1
+            if len(self._batch) >= self.batch_size:
+                self._queue.put(self._batch)
+                self._batch = []
+        self.frame += 1
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is _CLOSE:
+                    break
+                insert_many(SQL_INSERT_SAMPLES, batch, self.path)
+        except Exception as exc:
+            self._error = exc
+        finally:
+            close_connection(self.path)
+
+    def close(self):
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.session_id
@@ -0,0 +1,165 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from activity_features import FEATURE_SCHEMA, frame_features
+from realtime_pipeline import put_latest
+
+# Regole di conteggio e correzione per esercizio: angolo osservato, soglia sotto cui si
+# conta la ripetizione e soglia sopra cui la posizione non è corretta (None = nessun controllo).
+# Squat è la regola storica (schiena-femore 70/170). Le soglie di Affondi e Push-up sono
+# indicative: in fondo al movimento ginocchio e gomito arrivano a circa 90°; il ginocchio
+# quasi disteso (> 175°) indica un affondo non eseguito. Vanno tarate su video reali.
+EXERCISE_RULES = {
+    "Squat": {"joint": "back_thigh_left", "rep_below": 70, "bad_above": 170,
+              "feedback": "Posizione non corretta, abbassa di più le gambe!"},
+    "Affondi": {"joint": "knee_left", "rep_below": 90, "bad_above": 175,
+                "feedback": "Posizione non corretta, piega di più il ginocchio!"},
+    "Push-up": {"joint": "elbow_left", "rep_below": 90, "bad_above": None, "feedback": None},
+}
+
+# Regola usata quando l'esercizio è scelto a mano (riconoscimento spento): la stessa per
+# tutti gli esercizi, come prima delle regole per esercizio
+MANUAL_RULES = EXERCISE_RULES["Squat"]
+
+# Associazione classe del modello -> esercizio. Il file .keras non contiene i nomi delle
+# classi, quindi l'associazione si configura in questo file JSON ({"classe_3": "Squat", ...})
+CLASS_EXERCISES_PATH = "activity_classes.json"
+
+# Modello riaddestrato con train_activity_model sulle caratteristiche di activity_features
+RECOGNITION_MODEL_PATH = "activity_model_retrained.npz"
+
+# Segnale di chiusura per il thread di classificazione
+_CLOSE = object()
+
+
+# Associazione classe -> esercizio dal file JSON, oppure per nome se le classi del modello
+# hanno già il nome di un esercizio (modelli addestrati con train_activity_model)
+def load_class_exercises(model, path=CLASS_EXERCISES_PATH):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {name: name for name in model.class_names if name in EXERCISE_RULES}
+
+
+# Modello e associazione classe -> esercizio per il riconoscimento, oppure None se il
+# riconoscimento va disattivato: manca un modello riaddestrato con lo schema corrente di
+# activity_features (il modello storico .keras ha 23 ingressi ma non queste caratteristiche)
+# oppure nessuna classe del modello corrisponde a un esercizio di EXERCISE_RULES
+def load_recognition_model(path=RECOGNITION_MODEL_PATH, classes_path=CLASS_EXERCISES_PATH):
+    from activity_model import ActivityModel
+
+    if not os.path.exists(path):
+        print(f"Riconoscimento dell'esercizio disattivato: {path} assente, addestra il modello con "
+              f"train_activity_model.py")
+        return None
+    model = ActivityModel.load(path)
+    if model.feature_schema != FEATURE_SCHEMA:
+        print(f"Riconoscimento dell'esercizio disattivato: {path} non è stato addestrato con lo schema "
+              f"di caratteristiche corrente ({FEATURE_SCHEMA})")
+        return None
+    class_exercises = {name: exercise for name, exercise in load_class_exercises(model, classes_path).items()
+                       if name in model.class_names and exercise in EXERCISE_RULES}
+    if not class_exercises:
+        print(f"Riconoscimento dell'esercizio disattivato: nessuna classe di {path} associata a un esercizio "
+              f"(configura {classes_path})")
+        return None
+    return model, class_exercises
+
+
+# Riconoscimento dell'esercizio in tempo reale. A ogni frame update() calcola solo il
+# vettore di caratteristiche e lo aggiunge alla finestra mobile; ogni stride frame la
+# finestra intera viene classificata in un solo batch da un thread separato. Le probabilità
+# medie della finestra vengono smussate con una media esponenziale e l'esercizio attivo
+# cambia solo se la stessa classe resta sopra min_confidence per hold finestre consecutive.
+class ExerciseRecognizer:
+    def __init__(self, model=None, class_exercises=None, window=30, stride=10, smoothing=0.3,
+                 min_confidence=0.6, hold=3, initial=None):
+        if model is None:
+            loaded = load_recognition_model()
+            if loaded is None:
+                raise ValueError("Nessun modello di riconoscimento dell'esercizio utilizzabile")
+            model, class_exercises = loaded
+        self.model = model
+        self.class_exercises = class_exercises if class_exercises is not None else load_class_exercises(self.model)
+        self.window = window
+        self.stride = stride
+        self.smoothing = smoothing
+        self.min_confidence = min_confidence
+        self.hold = hold
+        self.exercise = initial
+        self.probabilities = None
+        self.switches = 0
+        self._features = deque(maxlen=window)
+        self._frames = 0
+        self._candidate = None
+        self._candidate_windows = 0
+        self._update_times = deque(maxlen=300)
+        self._batch_times = deque(maxlen=100)
+        self._dropped = 0
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="riconoscimento-esercizio", daemon=True)
+        self._thread.start()
+
+    # Da chiamare a ogni frame con i landmark (33, C) o None; restituisce l'esercizio attivo
+    def update(self, landmarks):
+        if landmarks is None:
+            return self.exercise
+        start = time.perf_counter()
+        self._features.append(frame_features(landmarks))
+        self._frames += 1
+        if len(self._features) == self.window and self._frames % self.stride == 0:
+            # Se il thread è ancora occupato la finestra vecchia viene sostituita dalla nuova
+            self._dropped += put_latest(self._queue, np.stack(self._features))
+        self._update_times.append(time.perf_counter() - start)
+        return self.exercise
+
+    def _run(self):
+        while True:
+            window = self._queue.get()
+            if window is _CLOSE:
+                break
+            start = time.perf_counter()
+            self._smooth(self.model.predict_proba(window).mean(axis=0))
+            self._batch_times.append(time.perf_counter() - start)
+
+    def _smooth(self, probabilities):
+        if self.probabilities is None:
+            self.probabilities = probabilities
+        else:
+            self.probabilities = self.smoothing * probabilities + (1 - self.smoothing) * self.probabilities
+        top = int(self.probabilities.argmax())
+        exercise = self.class_exercises.get(self.model.class_names[top])
+        if exercise is None or self.probabilities[top] < self.min_confidence:
+            self._candidate, self._candidate_windows = None, 0
+            return
+        if exercise == self._candidate:
+            self._candidate_windows += 1
+        else:
+            self._candidate, self._candidate_windows = exercise, 1
+        if self._candidate_windows >= self.hold and exercise != self.exercise:
+            self.exercise = exercise
+            self.switches += 1
+
+    def stats(self):
+        update_ms = np.mean(self._update_times) * 1e3 if self._update_times else 0.0
+        batch_ms = np.mean(self._batch_times) * 1e3 if self._batch_times else 0.0
+        return {"exercise": self.exercise, "frames": self._frames, "switches": self.switches,
+                "update_ms": update_ms, "batch_ms": batch_ms, "dropped_windows": self._dropped}
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Riconoscimento esercizio: {stats['exercise'] or 'nessuno'}, {stats['switches']} cambi, "
+              f"{stats['update_ms']:.3f} ms per frame, {stats['batch_ms']:.2f} ms per finestra, "
+              f"{stats['dropped_windows']} finestre scartate")
+        if not self.class_exercises:
+            print(f"Nessuna classe associata a un esercizio: configura {CLASS_EXERCISES_PATH}")
+
+    def close(self):
+        put_latest(self._queue, _CLOSE)
+        self._thread.join()
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import hashlib
+import io
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import database as db
+
+# Intestazioni dei due formati storici e mappatura verso le colonne di session_samples
+ANALYSIS_HEADER = ["Timestamp", "Repetitions", "Back-Thigh Angle"]
+ALLENAMENTO_HEADER = ["Ripetizione", "Angolo_Ginocchio", "Angolo_Schiena_Femore"]
+
+# Pattern dei file da importare
+FILE_PATTERN = re.compile(r"^(analysis|allenamento)_(\d{8}_\d{6}).*\.csv$")
+
+SQL_IMPORTED_STATS = "SELECT path, size, mtime FROM imported_paths"
+SQL_IMPORTED_HASHES = "SELECT sha256 FROM imported_files"
+SQL_UPDATE_STAT = "INSERT OR REPLACE INTO imported_paths (path, size, mtime, sha256) VALUES (?, ?, ?, ?)"
+SQL_MARK_IMPORTED = ("INSERT INTO imported_files (sha256, path, size, mtime, rows, imported_at) "
+                     "VALUES (?, ?, ?, ?, ?, ?)")
+SQL_SEED_PATHS = ("INSERT OR IGNORE INTO imported_paths (path, size, mtime, sha256) "
+                  "SELECT path, size, mtime, sha256 FROM imported_files")
+
+# Letture in corso per worker: limita i risultati (righe già normalizzate) tenuti in memoria
+FILES_IN_FLIGHT_PER_WORKER = 2
+
+
+# Registro dell'import: imported_files per contenuto (hash, per non importare due volte lo
+# stesso file) e imported_paths per percorso (dimensione e data per il controllo rapido).
+# Due copie con lo stesso contenuto hanno così ognuna il proprio controllo rapido.
+def initialize_import_table(path=db.DATABASE):
+    with db.transaction(path) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS imported_files (
+                            sha256 TEXT PRIMARY KEY,
+                            path TEXT,
+                            size INTEGER,
+                            mtime REAL,
+                            rows INTEGER,
+                            imported_at TEXT
+                        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS imported_paths (
+                            path TEXT PRIMARY KEY,
+                            size INTEGER,
+                            mtime REAL,
+                            sha256 TEXT
+                        )''')
+        # Registri creati prima di imported_paths: i file già importati restano da saltare
+        conn.execute(SQL_SEED_PATHS)
+
+
+# Trova i file analysis_*.csv e allenamento_*.csv nelle cartelle indicate (percorsi assoluti,
+# così report e registro dell'import non dipendono dalla cartella da cui si lancia l'import)
+def find_legacy_files(directories):
+    files = []
+    for directory in directories:
+        for folder, _, names in os.walk(os.path.abspath(directory)):
+            files.extend(os.path.join(folder, name) for name in names if FILE_PATTERN.match(name))
+    return sorted(files)
+
+
+def _float_or_none(value):
+    return float(value) if value not in ("", None) else None
+
+
+# Normalizza le righe di uno dei due formati in (frame, timestamp, ripetizioni, angolo schiena, angolo ginocchio)
+def normalize_rows(header, rows):
+    if header == ANALYSIS_HEADER:
+        return [(frame, timestamp, int(reps), _float_or_none(angle), None)
+                for frame, (timestamp, reps, angle) in enumerate(rows)]
+    if header == ALLENAMENTO_HEADER:
+        return [(frame, None, int(reps), _float_or_none(back_thigh), _float_or_none(knee))
+                for frame, (reps, knee, back_thigh) in enumerate(rows)]
+    raise ValueError(f"Formato non riconosciuto: {header}")
+
+
+# Worker: legge il file una sola volta, ne calcola l'hash e normalizza le righe
+def load_legacy_file(path):
+    with open(path, "rb") as f:
+        content = f.read()
+    stat = os.stat(path)
+    reader = csv.reader(io.StringIO(content.decode("utf-8-sig")))
+    # Alcuni file hanno una riga di dati biometrici ("Altezza: 178, Peso: 70, ...") prima
+    # dell'intestazione; i file vuoti non hanno righe da importare
+    header = next(reader, [])
+    while header and header not in (ANALYSIS_HEADER, ALLENAMENTO_HEADER) and ":" in header[0]:
+        header = next(reader, [])
+    rows = normalize_rows(header, [row for row in reader if row]) if header else []
+    return {
+        "path": path,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "rows": rows,
+    }
+
+
+# Scrive un file importato: campioni, report e registro dell'import nella stessa transazione
+def store_legacy_file(loaded, user_id, path=db.DATABASE):
+    match = FILE_PATTERN.match(os.path.basename(loaded["path"]))
+    session_id = f"{match.group(2)}_{loaded['sha256'][:8]}"
+    samples = [(user_id, session_id) + row for row in loaded["rows"]]
+    repetitions = max((row[2] for row in loaded["rows"]), default=0)
+    with db.transaction(path) as conn:
+        if samples:
+            conn.executemany(db.SQL_INSERT_SAMPLES, samples)
+            db.save_report(user_id, match.group(2), repetitions, loaded["path"], session_id, path)
+        conn.execute(SQL_MARK_IMPORTED, (loaded["sha256"], loaded["path"], loaded["size"], loaded["mtime"],
+                                         len(samples), datetime.now().isoformat(timespec="seconds")))
+        conn.execute(SQL_UPDATE_STAT, (loaded["path"], loaded["size"], loaded["mtime"], loaded["sha256"]))
+    return len(samples)
+
+
+# Importa i file nuovi o modificati; quelli con stesso percorso, dimensione e data di
+# modifica non vengono nemmeno letti, quelli con contenuto già importato vengono saltati.
+# Al pool vengono affidati al massimo FILES_IN_FLIGHT_PER_WORKER file per worker alla volta.
+def import_legacy(directories, user_id, workers=None, path=db.DATABASE):
+    db.initialize_db(path)
+    initialize_import_table(path)
+    conn = db.get_connection(path)
+    known_stats = {p: (size, mtime) for p, size, mtime in conn.execute(SQL_IMPORTED_STATS)}
+    known_hashes = {sha for (sha,) in conn.execute(SQL_IMPORTED_HASHES)}
+
+    files = []
+    for file_path in find_legacy_files(directories):
+        stat = os.stat(file_path)
+        if known_stats.get(file_path) != (stat.st_size, stat.st_mtime):
+            files.append(file_path)
+
+    start = time.perf_counter()
+    summary = {"files": 0, "skipped": 0, "errors": 0, "rows": 0}
+    workers = workers or os.cpu_count() or 1
+    pending = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for file_path in pending:
+            in_flight.append((file_path, executor.submit(load_legacy_file, file_path)))
+            if len(in_flight) >= workers * FILES_IN_FLIGHT_PER_WORKER:
+                break
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            next_path = next(pending, None)
+            if next_path is not None:
+                in_flight.append((next_path, executor.submit(load_legacy_file, next_path)))
+            try:
+                loaded = future.result()
+            except (ValueError, OSError, UnicodeDecodeError) as exc:
+                print(f"Errore su {file_path}: {exc}")
+                summary["errors"] += 1
+                continue
+            if loaded["sha256"] in known_hashes:
+                # Contenuto già importato (es. file toccato, spostato o copiato): si registra solo
+                # il controllo rapido del percorso, così al prossimo import non viene riletto
+                with db.transaction(path) as conn:
+                    conn.execute(SQL_UPDATE_STAT, (loaded["path"], loaded["size"], loaded["mtime"], loaded["sha256"]))
+                summary["skipped"] += 1
+                continue
+            summary["rows"] += store_legacy_file(loaded, user_id, path)
+            known_hashes.add(loaded["sha256"])
+            summary["files"] += 1
+
+    summary["seconds"] = time.perf_counter() - start
+    summary["rows_per_second"] = summary["rows"] / summary["seconds"] if summary["seconds"] > 0 else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa nel database i file analysis_*.csv e allenamento_*.csv")
+    parser.add_argument("directories", nargs="*", default=["."], help="cartelle da scandire (ricorsivamente)")
+    parser.add_argument("--user-id", type=int, required=True, help="utente a cui assegnare le sessioni importate")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--database", default=db.DATABASE)
+    args = parser.parse_args(argv)
+
+    summary = import_legacy(args.directories, args.user_id, args.workers, args.database)
+    print(f"Importati {summary['files']} file ({summary['rows']} righe) in {summary['seconds']:.2f} s: "
+          f"{summary['rows_per_second']:.0f} righe/s, {summary['skipped']} già presenti, {summary['errors']} errori")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+
+# Numero di landmark restituiti da MediaPipe Pose
+NUM_LANDMARKS = 33
+
+# Indici dei landmark di MediaPipe Pose usati negli angoli articolari
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+
+# Terne (a, vertice, c) degli angoli articolari
+JOINT_TRIPLES = {
+    "back_thigh_left": (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    "back_thigh_right": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    "knee_left": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "knee_right": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    "ankle_left": (LEFT_KNEE, LEFT_ANKLE, LEFT_FOOT_INDEX),
+    "ankle_right": (RIGHT_KNEE, RIGHT_ANKLE, RIGHT_FOOT_INDEX),
+    "elbow_left": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "elbow_right": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    "shoulder_left": (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    "shoulder_right": (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP),
+}
+
+
+# Converte i landmark di MediaPipe in un array (33, 4) di x, y, z, visibility
+def landmarks_to_array(landmarks):
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+
+
+# Risolve una lista di nomi o terne di indici in un array (K, 3)
+def resolve_triples(joints):
+    return np.array([JOINT_TRIPLES[joint] if isinstance(joint, str) else joint for joint in joints], dtype=np.intp)
+
+
+# Calcola tutti gli angoli (in gradi) per tutti i frame in un solo passaggio vettoriale.
+# landmarks: array (N, 33, C) con C >= 2 (C >= 3 per use_3d); restituisce un array (N, K).
+# In 2D l'angolo oltre 180° viene ripiegato come in calculate_angle; in 3D si usa il
+# prodotto scalare dei due segmenti, già compreso tra 0 e 180°.
+def joint_angles(landmarks, joints=tuple(JOINT_TRIPLES), use_3d=False):
+    landmarks = np.asarray(landmarks)
+    triples = resolve_triples(joints)
+    dims = 3 if use_3d else 2
+    a = landmarks[:, triples[:, 0], :dims].astype(np.float64)
+    b = landmarks[:, triples[:, 1], :dims].astype(np.float64)
+    c = landmarks[:, triples[:, 2], :dims].astype(np.float64)
+    ba = a - b
+    bc = c - b
+
+    if use_3d:
+        norms = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cosine = np.einsum("nkd,nkd->nk", ba, bc) / norms
+        return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+    radians = np.arctan2(bc[..., 1], bc[..., 0]) - np.arctan2(ba[..., 1], ba[..., 0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    return np.where(angle > 180.0, 360 - angle, angle)
+
+
+# Angolo in b (in gradi) tra i punti 2D a, b, c: la formula di riferimento, con math
+def calculate_angle(a, b, c):
+    radians = math.atan2(c[1] - b[1], c[0] - b[0]) - math.atan2(a[1] - b[1], a[0] - b[0])
+    angle = abs(radians * 180.0 / math.pi)
+    return 360 - angle if angle > 180.0 else angle
+
+
+# Angoli 2D di un singolo frame come lista di float: frame è un array (33, C) oppure la
+# lista dei landmark di MediaPipe, di cui si leggono solo i punti usati. Su un frame solo
+# l'overhead di NumPy (e la conversione di tutti i 33 landmark) supera il calcolo.
+def frame_angles(frame, joints=tuple(JOINT_TRIPLES)):
+    triples = [JOINT_TRIPLES[joint] if isinstance(joint, str) else joint for joint in joints]
+    if isinstance(frame, np.ndarray):
+        points = frame[:, :2].tolist()
+        return [calculate_angle(points[a], points[b], points[c]) for a, b, c in triples]
+    return [calculate_angle(*[(frame[index].x, frame[index].y) for index in triple]) for triple in triples]
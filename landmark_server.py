@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import math
+import struct
+import time
+import uuid
+
+import numpy as np
+
+from exercise_recognition import EXERCISE_RULES
+from joint_angles import NUM_LANDMARKS, calculate_angle, joint_angles, resolve_triples
+
+# Protocollo (TCP): il client invia una riga JSON di apertura {"exercise": "Squat", "session": "..."}
+# e poi messaggi binari: lunghezza (4 byte big-endian) + uno o più frame di 33x4 float32
+# little-endian (x, y, z, visibility; NaN = frame senza posa). Lunghezza 0 chiude la sessione.
+# Il server risponde con righe JSON: "ready", poi eventi "rep" e "feedback", infine "summary".
+# Con la riga di apertura {"stats": true} il server restituisce le proprie statistiche.
+# "session" è facoltativo (altrimenti lo genera il server); un id già attivo viene rifiutato.
+FRAME_BYTES = NUM_LANDMARKS * 4 * 4
+HEADER = struct.Struct(">I")
+LANDMARK_DTYPE = np.dtype("<f4")
+
+# Frame massimi in un messaggio (i client possono inviare più frame insieme)
+MAX_FRAMES_PER_MESSAGE = 256
+
+# Intervallo minimo tra due feedback dello stesso tipo, come per il feedback vocale
+FEEDBACK_INTERVAL = 3.0
+
+
+def _line(event):
+    return json.dumps(event).encode() + b"\n"
+
+
+# Stato di una sessione remota: stesse regole di conteggio e correzione di process_frame,
+# applicate a tutti i frame di un messaggio
+class LandmarkSession:
+    def __init__(self, session_id, exercise="Squat", feedback_interval=FEEDBACK_INTERVAL):
+        if exercise not in EXERCISE_RULES:
+            raise ValueError(f"Esercizio sconosciuto: {exercise}")
+        self.session_id = session_id
+        self.exercise = exercise
+        self.rules = EXERCISE_RULES[exercise]
+        self._triple = resolve_triples((self.rules["joint"],))[0]
+        self.feedback_interval = feedback_interval
+        self.frames = 0
+        self.pose_frames = 0
+        self.repetitions = 0
+        self.min_angle = None
+        self.max_angle = None
+        self._last_feedback = {}
+
+    # Elabora un blocco (N, 33, 4) di landmark e restituisce gli eventi da inviare al client
+    # Con un frame per messaggio l'overhead di NumPy supererebbe il calcolo: calculate_angle
+    # (math) sui soli tre punti dell'articolazione
+    def process(self, landmarks):
+        if len(landmarks) == 1:
+            angles = [calculate_angle(*landmarks[0, self._triple, :2].tolist())]
+        else:
+            angles = joint_angles(landmarks, (self.rules["joint"],))[:, 0].tolist()
+        rep_below, bad_above = self.rules["rep_below"], self.rules["bad_above"]
+        counted = None
+        bad = None
+        for frame, angle in enumerate(angles, self.frames):
+            # Frame senza posa
+            if math.isnan(angle):
+                continue
+            self.pose_frames += 1
+            if self.min_angle is None or angle < self.min_angle:
+                self.min_angle = angle
+            if self.max_angle is None or angle > self.max_angle:
+                self.max_angle = angle
+            if angle < rep_below:
+                self.repetitions += 1
+                counted = (frame, angle)
+            if bad_above is not None and angle > bad_above:
+                bad = frame
+        self.frames += len(angles)
+
+        events = []
+        if counted is not None:
+            events.append({"event": "rep", "repetitions": self.repetitions, "frame": counted[0], "angle": counted[1]})
+            self._feedback(events, "ripetizione", f"Ottimo! Ripetizione completata. Esercizio: {self.exercise}", counted[0])
+        if bad is not None:
+            self._feedback(events, "posizione", self.rules["feedback"], bad)
+        return events
+
+    def _feedback(self, events, kind, message, frame):
+        now = time.monotonic()
+        if now - self._last_feedback.get(kind, float("-inf")) < self.feedback_interval:
+            return
+        self._last_feedback[kind] = now
+        events.append({"event": "feedback", "kind": kind, "message": message, "frame": frame})
+
+    def summary(self):
+        return {"event": "summary", "session": self.session_id, "exercise": self.exercise, "frames": self.frames,
+                "pose_frames": self.pose_frames, "repetitions": self.repetitions, "min_angle": self.min_angle,
+                "max_angle": self.max_angle}
+
+
+# Server asyncio a processo singolo: ogni connessione è una sessione con il proprio stato.
+# Nessun thread né processo per sessione, quindi un core regge centinaia di sessioni.
+class LandmarkServer:
+    def __init__(self, feedback_interval=FEEDBACK_INTERVAL, max_frames_per_message=MAX_FRAMES_PER_MESSAGE):
+        self.feedback_interval = feedback_interval
+        self.max_bytes = max_frames_per_message * FRAME_BYTES
+        self.sessions = {}
+        self.total_sessions = 0
+        self.frames = 0
+        self.messages = 0
+        self.events = 0
+        self.errors = 0
+        self._started = time.monotonic()
+        self._cpu_start = time.process_time()
+
+    async def start(self, host="127.0.0.1", port=8765):
+        server = await asyncio.start_server(self._handle, host, port)
+        print(f"Server dei landmark su {host}:{port}")
+        return server
+
+    async def _handle(self, reader, writer):
+        session = None
+        try:
+            try:
+                hello = json.loads(await reader.readline() or b"{}")
+            except ValueError:
+                hello = {}
+            if isinstance(hello, dict) and hello.get("stats"):
+                writer.write(_line(self.stats()))
+                await writer.drain()
+                return
+            try:
+                session = self._open_session(hello)
+            except ValueError as exc:
+                writer.write(_line({"event": "error", "message": str(exc)}))
+                await writer.drain()
+                self.errors += 1
+                return
+            self.total_sessions += 1
+            writer.write(_line({"event": "ready", "session": session.session_id, "exercise": session.exercise}))
+
+            while True:
+                (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if length == 0:
+                    break
+                if length % FRAME_BYTES or length > self.max_bytes:
+                    writer.write(_line({"event": "error", "message": f"Messaggio di {length} byte non valido"}))
+                    self.errors += 1
+                    break
+                payload = await reader.readexactly(length)
+                landmarks = np.frombuffer(payload, dtype=LANDMARK_DTYPE).reshape(-1, NUM_LANDMARKS, 4)
+                events = session.process(landmarks)
+                self.messages += 1
+                self.frames += len(landmarks)
+                if events:
+                    self.events += len(events)
+                    writer.write(b"".join(_line(event) for event in events))
+                    # Se il client non legge gli eventi, smette di leggere anche i suoi frame
+                    await writer.drain()
+
+            writer.write(_line(session.summary()))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session is not None:
+                self.sessions.pop(session.session_id, None)
+            writer.close()
+
+    # Crea la sessione descritta dalla riga di apertura. Un identificativo scelto dal client
+    # deve essere una stringa non già in uso: due connessioni con lo stesso id si
+    # sovrascriverebbero in self.sessions e la prima a chiudersi rimuoverebbe l'altra.
+    def _open_session(self, hello):
+        if not isinstance(hello, dict):
+            raise ValueError("La riga di apertura deve essere un oggetto JSON")
+        session_id = hello.get("session") or uuid.uuid4().hex
+        if not isinstance(session_id, str):
+            raise ValueError("L'identificativo della sessione deve essere una stringa")
+        if session_id in self.sessions:
+            raise ValueError(f"Sessione {session_id} già attiva")
+        exercise = hello.get("exercise", "Squat")
+        if not isinstance(exercise, str):
+            raise ValueError(f"Esercizio sconosciuto: {exercise}")
+        session = LandmarkSession(session_id, exercise, self.feedback_interval)
+        self.sessions[session_id] = session
+        return session
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started
+        cpu = time.process_time() - self._cpu_start
+        return {"event": "stats", "active_sessions": len(self.sessions), "total_sessions": self.total_sessions,
+                "frames": self.frames, "messages": self.messages, "events": self.events, "errors": self.errors,
+                "elapsed_seconds": elapsed, "cpu_seconds": cpu,
+                "frames_per_second": self.frames / elapsed if elapsed > 0 else 0.0,
+                "cpu_us_per_frame": cpu / self.frames * 1e6 if self.frames else None}
+
+
+async def serve(host, port, feedback_interval):
+    server = await LandmarkServer(feedback_interval).start(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server per flussi di landmark da molte sessioni simultanee")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--feedback-interval", type=float, default=FEEDBACK_INTERVAL,
+                        help="secondi minimi tra due feedback dello stesso tipo")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.feedback_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import time
+
+import numpy as np
+
+from joint_angles import NUM_LANDMARKS
+
+# Nomi dei file che compongono una serie di landmark salvata su disco
+LANDMARKS_FILE = "landmarks.npy"
+FRAMES_FILE = "frames.npy"
+TIMESTAMPS_FILE = "timestamps.npy"
+
+
+# Registratore dei landmark di una sessione: buffer float32 (N, 33, 4) preallocato che
+# raddoppia quando è pieno, con indice del frame e timestamp per ogni riga (di default
+# monotono; con clock=time.time l'orario di sistema, che resta valido dopo il salvataggio).
+# Occupa 544 byte per frame e si salva come .npy ricaricabili in memory-map.
+class LandmarkRecorder:
+    def __init__(self, capacity=1024, clock=time.monotonic):
+        self.clock = clock
+        self.landmarks = np.empty((capacity, NUM_LANDMARKS, 4), dtype=np.float32)
+        self.frames = np.empty(capacity, dtype=np.int64)
+        self.timestamps = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+        self._next_frame = 0
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        capacity = 2 * len(self.frames)
+        for name in ("landmarks", "frames", "timestamps"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    # Registra un frame; landmarks None (posa non rilevata) viene salvato come NaN
+    def append(self, landmarks, frame_index=None, timestamp=None):
+        if self.size == len(self.frames):
+            self._grow()
+        if frame_index is None:
+            frame_index = self._next_frame
+        self.landmarks[self.size] = np.nan if landmarks is None else landmarks
+        self.frames[self.size] = frame_index
+        self.timestamps[self.size] = self.clock() if timestamp is None else timestamp
+        self.size += 1
+        self._next_frame = frame_index + 1
+
+    # Viste (senza copia) sui frame registrati
+    def view(self):
+        return self.frames[:self.size], self.timestamps[:self.size], self.landmarks[:self.size]
+
+    def save(self, directory):
+        return save_series(directory, *self.view())
+
+
+# Salva una serie (frames, timestamps, landmarks), registrata o riletta da disco
+def save_series(directory, frames, timestamps, landmarks):
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, LANDMARKS_FILE), landmarks)
+    np.save(os.path.join(directory, FRAMES_FILE), frames)
+    np.save(os.path.join(directory, TIMESTAMPS_FILE), timestamps)
+    return directory
+
+
+# Ricarica una serie salvata; con mmap=True i dati restano su disco e vengono letti su richiesta
+def load_landmarks(directory, mmap=True):
+    mode = "r" if mmap else None
+    frames = np.load(os.path.join(directory, FRAMES_FILE), mmap_mode=mode)
+    timestamps = np.load(os.path.join(directory, TIMESTAMPS_FILE), mmap_mode=mode)
+    landmarks = np.load(os.path.join(directory, LANDMARKS_FILE), mmap_mode=mode)
+    return frames, timestamps, landmarks
@@ -1,45 +1,54 @@
-import cv2
-import mediapipe as mp
-import numpy as np
-import pandas as pd
-import os
+# Importato per primo: segna l'istante di avvio per misurare i tempi di avvio
+from warmup import BackgroundLoader, report_first_inference, report_first_window, warm_up_pose
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog, Label
-import pyttsx3  # Per il feedback vocale
-import matplotlib.pyplot as plt  # Per il grafico delle ripetizioni/angoli
-from fpdf import FPDF  # Per creare report PDF
-
-# Inizializza MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
-mp_drawing = mp.solutions.drawing_utils
-
-# Inizializza il motore di sintesi vocale
-engine = pyttsx3.init()
-
-# Funzione per calcolare l'angolo tra tre punti
-def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
-
-# Funzione per salvare i dati in CSV
+from voice_feedback import VoiceFeedback  # Per il feedback vocale
+from joint_angles import frame_angles, landmarks_to_array
+from exercise_recognition import EXERCISE_RULES, MANUAL_RULES, ExerciseRecognizer
+from background_analysis import AnalysisSession
+
+# OpenCV, MediaPipe, pandas, matplotlib e fpdf vengono importati solo quando servono:
+# la finestra compare subito e Pose e il modello di attività si caricano in background
+
+# OpenCV e le soluzioni di MediaPipe usate a ogni frame: risolte una sola volta da
+# create_pose nel caricamento in background, prima che un'analisi possa partire
+cv2 = None
+mp_pose = None
+mp_drawing = None
+
+# Inizializza MediaPipe Pose e lo riscalda su una persona disegnata (su un frame vuoto
+# girerebbe solo il detector)
+def create_pose():
+    global cv2, mp_pose, mp_drawing
+    import cv2
+    import mediapipe as mp
+    mp_pose = mp.solutions.pose
+    mp_drawing = mp.solutions.drawing_utils
+    return warm_up_pose(mp_pose.Pose())
+
+# Modello di riconoscimento dell'attività (inferenza NumPy, senza TensorFlow) e associazione
+# classe -> esercizio; None se non c'è un modello riaddestrato con le caratteristiche correnti
+def create_activity_model():
+    from exercise_recognition import load_recognition_model
+    return load_recognition_model()
+
+pose_loader = BackgroundLoader("Pose", create_pose)
+activity_model_loader = BackgroundLoader("Modello di attività", create_activity_model)
+
+# Inizializza il feedback vocale (sintesi su un thread separato, mai bloccante)
+voice = VoiceFeedback()
+
+# Funzione per salvare i dati: completa il CSV scritto a blocchi durante la sessione
 def save_data(data):
-    filename = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    filepath = os.path.join(os.getcwd(), filename)
-    df = pd.DataFrame(data, columns=["Timestamp", "Repetitions", "Back-Thigh Angle"])
-    df.to_csv(filepath, index=False)
-    print(f"File salvato: {filepath}")
-    generate_report(data)  # Crea anche il report PDF
+    import pandas as pd
+    filepath = data.close()
+    # Il report PDF rilegge le righe dal file invece di tenerle in memoria
+    generate_report(pd.read_csv(filepath).itertuples(index=False))
 
 # Funzione per creare un report in PDF
 def generate_report(data):
+    from fpdf import FPDF  # Per creare report PDF
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font('Arial', 'B', 12)
@@ -56,138 +65,185 @@ def generate_report(data):
     pdf.output(report_filename)
     print(f"Report salvato come PDF: {report_filename}")
 
-# Funzione per il feedback vocale
-def give_feedback(message):
-    engine.say(message)
-    engine.runAndWait()
+# Funzione per il feedback vocale: accoda il messaggio senza fermare il video
+def give_feedback(message, kind=None):
+    voice.say(message, kind)
 
-# Funzione per elaborare ogni frame e rilevare la posa
-def process_frame(frame, rep_count, data, exercise_type, angle_history, rep_time):
+# Funzione per elaborare ogni frame e rilevare la posa.
+# Con recognizer l'esercizio viene riconosciuto dal modello di attività e le regole
+# (angolo, soglie, messaggi) sono quelle dell'esercizio riconosciuto; senza, vale per
+# ogni esercizio la regola storica schiena-femore (MANUAL_RULES).
+def process_frame(frame, rep_count, data, exercise_type, angle_history, rep_time, pose, recognizer=None):
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     result = pose.process(rgb_frame)
     back_thigh_angle = None
 
     if result.pose_landmarks:
         mp_drawing.draw_landmarks(frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        landmarks = result.pose_landmarks.landmark
-        shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y]
-        hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP].y]
-        knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE].y]
+        landmarks = landmarks_to_array(result.pose_landmarks.landmark)
+        if recognizer is not None:
+            exercise_type = recognizer.update(landmarks) or exercise_type
+            rules = EXERCISE_RULES[exercise_type]
+        else:
+            rules = MANUAL_RULES
 
-        # Calcolo angolo tra schiena e femore
-        back_thigh_angle = calculate_angle(shoulder, hip, knee)
+        # Calcolo angolo tra schiena e femore e angolo dell'esercizio
+        back_thigh_angle, angle = frame_angles(landmarks, ("back_thigh_left", rules["joint"]))
 
         # Mostra angolo sul video
-        cv2.putText(frame, f"Angolo: {int(back_thigh_angle)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, f"{exercise_type} - Angolo: {int(angle)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         # Aggiungi l'angolo alla cronologia
-        angle_history.append(back_thigh_angle)
+        angle_history.append(angle)
 
         # Rilevamento delle ripetizioni
-        if back_thigh_angle < 70:
+        if angle < rules["rep_below"]:
             rep_count += 1
             rep_time.append(datetime.now())  # Aggiungi il tempo della ripetizione
             cv2.putText(frame, f"Ripetizioni: {rep_count}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
             # Feedback vocale per una ripetizione corretta
-            give_feedback(f"Ottimo! Ripetizione completata. Esercizio: {exercise_type}")
+            give_feedback(f"Ottimo! Ripetizione completata. Esercizio: {exercise_type}", "ripetizione")
 
         # Controllo della posizione corretta
-        if back_thigh_angle > 170:
+        if rules["bad_above"] is not None and angle > rules["bad_above"]:
             cv2.putText(frame, "Posizione non corretta!", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            give_feedback("Posizione non corretta, abbassa di più le gambe!")
+            give_feedback(rules["feedback"], "posizione")
 
         # Salva dati per ogni ripetizione
         data.append([datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle])
 
     return frame, rep_count, data, angle_history, rep_time
 
-# Funzione per analizzare il video
-def analyze_video(video_path, exercise_type):
-    cap = cv2.VideoCapture(video_path)
+# Esercizio scelto nel menu: le variabili Tk si leggono solo dal thread di Tk, il thread
+# di analisi legge questa copia aggiornata a ogni modifica del menu
+selected_exercise = {"value": "Squat"}
+
+# Sessione di analisi in corso (una alla volta)
+current_session = None
+
+# Funzione per analizzare un video o la webcam (source 0). Gira nel thread di session
+# (AnalysisSession): pubblica anteprima e avanzamento e si ferma se la sessione viene annullata
+def analyze_source(source, session):
+    import time
+    from pose_analysis import open_session_writer
+
+    pose = pose_loader.get()
+    cap = cv2.VideoCapture(source)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if source != 0 else 0
     rep_count = 0
-    data = []
+    frames = 0
+    # Le righe vengono scritte su disco a blocchi durante la sessione
+    data = open_session_writer()
     angle_history = []
     rep_time = []
+    # Senza un modello utilizzabile vale sempre l'esercizio scelto nel menu
+    recognition = activity_model_loader.get()
+    recognizer = ExerciseRecognizer(*recognition) if recognition is not None else None
+    exercise_type = selected_exercise["value"]
 
-    while cap.isOpened():
+    while cap.isOpened() and not session.cancelled.is_set():
         ret, frame = cap.read()
         if not ret:
             break
 
-        frame, rep_count, data, angle_history, rep_time = process_frame(frame, rep_count, data, exercise_type, angle_history, rep_time)
-
-        # Mostra il frame elaborato
-        cv2.imshow("Esercizio", frame)
-
-        # Premi 'q' per uscire dal video
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
+        # Finché il modello non riconosce l'esercizio vale la scelta del menu
+        if recognizer is None or recognizer.exercise is None:
+            exercise_type = selected_exercise["value"]
+        start = time.perf_counter()
+        frame, rep_count, data, angle_history, rep_time = process_frame(frame, rep_count, data, exercise_type, angle_history, rep_time, pose, recognizer)
+        if frames == 0:
+            report_first_inference(time.perf_counter() - start)
+        if recognizer is not None:
+            exercise_type = recognizer.exercise or exercise_type
+        frames += 1
+
+        # Anteprima e avanzamento vengono mostrati dal thread di Tk
+        session.show(frame)
+        session.report(frames=frames, total=total, repetitions=rep_count, exercise=exercise_type)
 
     cap.release()
-    cv2.destroyAllWindows()
 
-    # Salva i dati al termine dell'analisi
+    # Salva i dati al termine (anche se annullata: resta quanto analizzato fino a quel momento)
     save_data(data)
-
-    # Mostra il grafico delle ripetizioni nel tempo
+    voice.print_stats()
+    if recognizer is not None:
+        recognizer.close()
+        recognizer.print_stats()
+    return {"frames": frames, "repetitions": rep_count, "rep_time": rep_time, "exercise": exercise_type,
+            "cancelled": session.cancelled.is_set()}
+
+# Mostra il grafico delle ripetizioni nel tempo senza bloccare l'interfaccia
+def show_progress_chart(rep_time, exercise_type):
+    import matplotlib.pyplot as plt  # Per il grafico delle ripetizioni/angoli
+
+    if not rep_time:
+        return
     timestamps = [(time - rep_time[0]).total_seconds() for time in rep_time]
+    plt.figure()
     plt.plot(timestamps, range(1, len(rep_time) + 1), label='Ripetizioni')
     plt.xlabel('Tempo (secondi)')
     plt.ylabel('Numero di ripetizioni')
     plt.title(f"Progresso - Esercizio {exercise_type}")
     plt.legend()
-    plt.show()
+    plt.show(block=False)
+
+# Avanzamento dell'analisi, sul thread di Tk
+def show_progress(progress):
+    text = f"Frame {progress['frames']}"
+    if progress["total"] > 0:
+        text += f"/{progress['total']} ({100 * progress['frames'] / progress['total']:.0f}%)"
+    status_label.config(text=f"{text} - {progress['exercise']} - Ripetizioni: {progress['repetitions']}")
+    # L'esercizio riconosciuto viene mostrato anche nel menu di selezione
+    if progress["exercise"] != exercise_var.get():
+        exercise_var.set(progress["exercise"])
+
+def set_running(running):
+    state = tk.DISABLED if running else tk.NORMAL
+    start_button.config(state=state)
+    load_button.config(state=state)
+    cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+
+def analysis_done(result):
+    set_running(False)
+    outcome = "annullata" if result["cancelled"] else "completata"
+    status_label.config(text=f"Analisi {outcome}: {result['repetitions']} ripetizioni in {result['frames']} frame")
+    show_progress_chart(result["rep_time"], result["exercise"])
+
+def analysis_failed(error):
+    set_running(False)
+    status_label.config(text=f"Analisi non riuscita: {error}")
+
+# Avvia l'analisi in un thread: la finestra resta reattiva per tutta la durata
+def start_analysis(source, window_name):
+    global current_session
+    set_running(True)
+    status_label.config(text="Analisi in corso...")
+    current_session = AnalysisSession(root, lambda session: analyze_source(source, session),
+                                      on_progress=show_progress, on_done=analysis_done,
+                                      on_error=analysis_failed, window_name=window_name).start()
+
+def cancel_analysis():
+    if current_session is not None:
+        current_session.cancel()
+        status_label.config(text="Annullamento in corso...")
 
 # Funzione per caricare e avviare il video
 def load_video():
     video_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4 *.avi")])
     if video_path:
-        exercise_type = exercise_var.get()
-        analyze_video(video_path, exercise_type)
+        start_analysis(video_path, "Esercizio")
 
 # Funzione per attivare la fotocamera in tempo reale
 def start_camera():
-    cap = cv2.VideoCapture(0)
-    rep_count = 0
-    data = []
-    angle_history = []
-    rep_time = []
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        exercise_type = exercise_var.get()
-        frame, rep_count, data, angle_history, rep_time = process_frame(frame, rep_count, data, exercise_type, angle_history, rep_time)
+    start_analysis(0, "Esercizio in tempo reale")
 
-        # Mostra il frame elaborato
-        cv2.imshow("Esercizio in tempo reale", frame)
-
-        # Premi 'q' per uscire dalla fotocamera
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-    # Salva i dati al termine
-    save_data(data)
-
-    # Mostra il grafico delle ripetizioni nel tempo
-    timestamps = [(time - rep_time[0]).total_seconds() for time in rep_time]
-    plt.plot(timestamps, range(1, len(rep_time) + 1), label='Ripetizioni')
-    plt.xlabel('Tempo (secondi)')
-    plt.ylabel('Numero di ripetizioni')
-    plt.title(f"Progresso - Esercizio {exercise_type}")
-    plt.legend()
-    plt.show()
-
-# Configura l'interfaccia grafica
+# Configura l'interfaccia grafica; i caricamenti partono mentre l'utente compila i dati
+pose_loader.start()
+activity_model_loader.start()
 root = tk.Tk()
 root.title("Palestra AI - Analisi Esercizi")
-root.geometry("400x350")
+root.geometry("400x450")
 
 # Etichette e pulsante per caricare il video
 label = Label(root, text="Benvenuto in Palestra AI! Inserisci i tuoi dati biometrici e scegli l'esercizio")
@@ -227,6 +283,7 @@ exercise_var = tk.StringVar(value="Squat")
 exercise_options = ["Squat", "Affondi", "Push-up"]
 exercise_menu = tk.OptionMenu(root, exercise_var, *exercise_options)
 exercise_menu.pack(pady=10)
+exercise_var.trace_add("write", lambda *args: selected_exercise.update(value=exercise_var.get()))
 
 # Pulsante per avviare la webcam
 start_button = tk.Button(root, text="Avvia Webcam", command=start_camera)
@@ -236,9 +293,16 @@ start_button.pack(pady=10)
 load_button = tk.Button(root, text="Carica Video", command=load_video)
 load_button.pack(pady=10)
 
+# Pulsante per annullare l'analisi in corso e stato dell'analisi
+cancel_button = tk.Button(root, text="Annulla analisi", command=cancel_analysis, state=tk.DISABLED)
+cancel_button.pack(pady=5)
+status_label = Label(root, text="")
+status_label.pack(pady=5)
+
 # Pulsante per terminare l'allenamento
 end_button = tk.Button(root, text="Fine Allenamento", command=root.quit)
 end_button.pack(pady=10)
 
 # Avvia l'interfaccia
+report_first_window(root)
 root.mainloop()
@@ -1,16 +1,14 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-import pandas as pd
-import os
-import sqlite3
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog, messagebox, Label
 import matplotlib.pyplot as plt
-
-# Impostazioni e configurazione del database
-DATABASE = "palestra_ai.db"
+from realtime_pipeline import RealtimePipeline
+from pose_analysis import open_session_writer
+import database as db
+from database import initialize_db, login_user
 
 # Inizializza MediaPipe Pose
 mp_pose = mp.solutions.pose
@@ -18,54 +16,14 @@ pose = mp_pose.Pose()
 mp_drawing = mp.solutions.drawing_utils
 
 # Crea il database se non esiste
-def create_database():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        email TEXT UNIQUE,
-                        password TEXT,
-                        name TEXT,
-                        surname TEXT,
-                        dob TEXT,
-                        height REAL,
-                        weight REAL,
-                        femur_length REAL,
-                        tibia_length REAL
-                    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS reports (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        timestamp TEXT,
-                        repetitions INTEGER,
-                        file_path TEXT,
-                        FOREIGN KEY(user_id) REFERENCES users(id)
-                    )''')
-    conn.commit()
-    conn.close()
-
-create_database()
+initialize_db()
 
 # Funzioni di autenticazione e registrazione
 def register_user(email, password, name, surname, dob, height, weight, femur_length, tibia_length):
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("INSERT INTO users (email, password, name, surname, dob, height, weight, femur_length, tibia_length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                       (email, password, name, surname, dob, height, weight, femur_length, tibia_length))
-        conn.commit()
+    if db.register_user(email, password, name, surname, dob, height, weight, femur_length, tibia_length):
         messagebox.showinfo("Registrazione", "Registrazione avvenuta con successo!")
-    except sqlite3.IntegrityError:
+    else:
         messagebox.showerror("Errore", "Email già registrata!")
-    conn.close()
-
-def login_user(email, password):
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ? AND password = ?", (email, password))
-    user = cursor.fetchone()
-    conn.close()
-    return user
 
 # Funzione per calcolare l'angolo tra tre punti
 def calculate_angle(a, b, c):
@@ -76,32 +34,67 @@ def calculate_angle(a, b, c):
         angle = 360 - angle
     return angle
 
-# Funzione per salvare report in CSV
-def save_report(user_id, repetitions, data):
+# Funzione per salvare il report: completa il CSV scritto a blocchi durante la sessione e
+# chiude la serie dei campioni, da cui save_report calcola il riepilogo della sessione
+def save_report(user_id, repetitions, data, samples):
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"analysis_{timestamp}.csv"
-    filepath = os.path.join(os.getcwd(), filename)
-    pd.DataFrame(data, columns=["Timestamp", "Repetitions", "Back-Thigh Angle"]).to_csv(filepath, index=False)
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO reports (user_id, timestamp, repetitions, file_path) VALUES (?, ?, ?, ?)",
-                   (user_id, timestamp, repetitions, filepath))
-    conn.commit()
-    conn.close()
-    print(f"File salvato: {filepath}")
-
-# Funzione per visualizzare i report
+    filepath = data.close()
+    db.save_report(user_id, timestamp, repetitions, filepath, samples.close())
+
+# Report mostrati per pagina
+REPORTS_PER_PAGE = 20
+
+# Riga della lista dei report a partire dal riepilogo della sessione
+def format_summary(summary):
+    timestamp, _, repetitions, duration, min_angle, max_angle, avg_tempo, _ = summary
+    text = f"{timestamp} - {repetitions} ripetizioni"
+    if duration is not None:
+        text += f" - {duration:.0f} s"
+    if min_angle is not None:
+        text += f" - angolo {min_angle:.0f}-{max_angle:.0f}°"
+    if avg_tempo is not None:
+        text += f" - {avg_tempo:.1f} s/rip"
+    return text
+
+# Funzione per visualizzare i report, una pagina alla volta
 def show_reports(user_id):
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT timestamp, repetitions, file_path FROM reports WHERE user_id = ?", (user_id,))
-    reports = cursor.fetchall()
-    conn.close()
-    report_text = "\n".join([f"{timestamp} - {repetitions} ripetizioni - {file_path}" for timestamp, repetitions, file_path in reports])
-    messagebox.showinfo("Report", report_text or "Nessun report disponibile")
+    window = tk.Toplevel()
+    window.title("Report")
+    listbox = tk.Listbox(window, width=70, height=REPORTS_PER_PAGE)
+    listbox.pack(padx=10, pady=10)
+    buttons = tk.Frame(window)
+    buttons.pack(pady=5)
+    # Cursori delle pagine visitate, per tornare indietro senza rileggere dall'inizio
+    cursors = [None]
+    next_cursor = None
+
+    def load_page():
+        nonlocal next_cursor
+        rows, next_cursor = db.get_report_page(user_id, REPORTS_PER_PAGE, cursors[-1])
+        listbox.delete(0, tk.END)
+        for row in rows:
+            listbox.insert(tk.END, format_summary(row))
+        if not rows:
+            listbox.insert(tk.END, "Nessun report disponibile")
+        previous_button.config(state=tk.NORMAL if len(cursors) > 1 else tk.DISABLED)
+        next_button.config(state=tk.NORMAL if next_cursor else tk.DISABLED)
+
+    def previous_page():
+        cursors.pop()
+        load_page()
+
+    def next_page():
+        cursors.append(next_cursor)
+        load_page()
+
+    previous_button = tk.Button(buttons, text="Precedenti", command=previous_page)
+    previous_button.pack(side=tk.LEFT, padx=5)
+    next_button = tk.Button(buttons, text="Successivi", command=next_page)
+    next_button.pack(side=tk.LEFT, padx=5)
+    load_page()
 
 # Funzione per processare i frame con feedback in tempo reale
-def process_frame(frame, rep_count, data):
+def process_frame(frame, rep_count, data, samples=None):
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     result = pose.process(rgb_frame)
     back_thigh_angle = None
@@ -122,28 +115,27 @@ def process_frame(frame, rep_count, data):
 
         data.append([datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle])
 
+    if samples is not None:
+        samples.record(datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle)
+
     return frame, rep_count, data
 
 # Funzione per avviare l'allenamento in tempo reale con webcam
 def start_realtime_analysis(user_id):
-    cap = cv2.VideoCapture(0)
     rep_count = 0
-    data = []
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame, rep_count, data = process_frame(frame, rep_count, data)
-        cv2.imshow("Allenamento in Tempo Reale", frame)
-
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    save_report(user_id, rep_count, data)
+    # Le righe vengono scritte su disco a blocchi durante la sessione
+    data = open_session_writer()
+    samples = db.SampleRecorder(user_id)
+
+    def elabora(frame):
+        nonlocal rep_count
+        frame, rep_count, _ = process_frame(frame, rep_count, data, samples)
+        return frame
+
+    pipeline = RealtimePipeline(0, elabora, "Allenamento in Tempo Reale")
+    pipeline.run()
+    pipeline.print_stats()
+    save_report(user_id, rep_count, data, samples)
 
 # Classe principale dell'interfaccia grafica
 class PalestraAIApp:
@@ -1,171 +1,161 @@
-import cv2
-import mediapipe as mp
-import numpy as np
-import pandas as pd
-import os
-import sqlite3
+# Importato per primo: segna l'istante di avvio per misurare i tempi di avvio
+from warmup import BackgroundLoader, report_first_inference, report_first_window, warm_up_pose
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from matplotlib import pyplot as plt
-
-# Costante per il database
-DATABASE = "palestra_ai.db"
-
-# Creazione del database e della tabella utenti
-def initialize_db():
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        email TEXT UNIQUE,
-                        password TEXT,
-                        name TEXT,
-                        surname TEXT,
-                        dob TEXT,
-                        height INTEGER,
-                        weight INTEGER,
-                        femur_length INTEGER,
-                        tibia_length INTEGER
-                      )''')
-    conn.commit()
-    conn.close()
-
-# Funzione per effettuare il login
-def login_user(email, password):
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email = ? AND password = ?", (email, password))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-# Funzione per registrare un nuovo utente
-def register_user(email, password, name, surname, dob, height, weight, femur_length, tibia_length):
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''INSERT INTO users (email, password, name, surname, dob, height, weight, femur_length, tibia_length)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                       (email, password, name, surname, dob, height, weight, femur_length, tibia_length))
-        conn.commit()
-        success = True
-    except sqlite3.IntegrityError:
-        success = False
-    conn.close()
-    return success
-
-# Funzione per calcolare l'angolo tra tre punti
-def calculate_angle(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
-
-# Funzione per salvare i dati in CSV
-def save_data(data):
-    filename = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    filepath = os.path.join(os.getcwd(), filename)
-    df = pd.DataFrame(data, columns=["Timestamp", "Repetitions", "Back-Thigh Angle"])
-    df.to_csv(filepath, index=False)
-    print(f"File salvato: {filepath}")
-
-# Funzione per elaborare ogni frame e rilevare la posa
-def process_frame(frame, rep_count, data):
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = pose.process(rgb_frame)
-    back_thigh_angle = None
-
-    if result.pose_landmarks:
-        mp_drawing.draw_landmarks(frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        landmarks = result.pose_landmarks.landmark
-        shoulder = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y]
-        hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP].y]
-        knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE].y]
-
-        # Calcolo angolo tra schiena e femore
-        back_thigh_angle = calculate_angle(shoulder, hip, knee)
-
-        # Mostra angolo sul video
-        cv2.putText(frame, f"Angolo: {int(back_thigh_angle)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        # Controllo ripetizioni in base all'angolo
-        if back_thigh_angle < 70:
-            rep_count += 1
-            cv2.putText(frame, f"Ripetizioni: {rep_count}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        # Salva dati per ogni ripetizione
-        data.append([datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle])
-
-    return frame, rep_count, data
-
-# Funzione principale per analizzare il video
-def analyze_video(video_path):
+from database import SampleRecorder, initialize_db, login_user, register_user, save_report
+from background_analysis import AnalysisSession
+
+# OpenCV, MediaPipe, pandas e i moduli di analisi vengono importati solo quando servono:
+# la finestra di login compare subito e il grafo di Pose si carica in background
+
+# Registra nel database il report di una sessione conclusa
+def save_session(user_id, rep_count, filepath, samples):
+    session_id = samples.close()
+    save_report(user_id, datetime.now().strftime('%Y%m%d_%H%M%S'), rep_count, filepath, session_id)
+
+# Funzione principale per analizzare il video. Gira nel thread di session
+# (AnalysisSession): pubblica anteprima e avanzamento e si ferma se la sessione viene annullata
+def analyze_video(video_path, user_id, session):
+    import time
+    import cv2
+    from pose_analysis import landmarks_path, open_session_writer, process_frame, replay_landmarks, save_landmarks
+    from landmark_store import LandmarkRecorder, save_series
+    from pose_cache import DEFAULT_CACHE_DIR, PoseCache, cache_key
+
+    # Le righe vengono scritte su disco a blocchi durante la sessione
+    data = open_session_writer()
+    samples = SampleRecorder(user_id)
+    cache = PoseCache(DEFAULT_CACHE_DIR)
+    key = cache_key(video_path)
+
+    # Video già analizzato con la stessa configurazione: regole applicate ai landmark in cache
+    series = cache.get(key)
+    if series is not None:
+        rep_count, data = replay_landmarks(series, data, samples)
+        frames = len(series[2])
+        session.report(frames=frames, total=frames, repetitions=rep_count)
+        filepath = data.close()
+        save_series(landmarks_path(filepath), *series)
+        save_session(user_id, rep_count, filepath, samples)
+        return {"frames": frames, "repetitions": rep_count, "file": filepath, "cancelled": False}
+
+    pose = pose_loader.get()
     cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     rep_count = 0
-    data = []
+    frames = 0
+    # Timestamp di sistema, validi anche quando la serie viene riletta dalla cache
+    recorder = LandmarkRecorder(clock=time.time)
 
-    while cap.isOpened():
+    while cap.isOpened() and not session.cancelled.is_set():
         ret, frame = cap.read()
         if not ret:
             break
 
-        frame, rep_count, data = process_frame(frame, rep_count, data)
+        start = time.perf_counter()
+        frame, rep_count, data = process_frame(frame, rep_count, data, pose, recorder=recorder, samples=samples)
+        if frames == 0:
+            report_first_inference(time.perf_counter() - start)
+        frames += 1
 
-        # Mostra il frame elaborato
-        cv2.imshow("Esercizio", frame)
-
-        # Premi 'q' per uscire dal video
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
+        # Anteprima e avanzamento vengono mostrati dal thread di Tk
+        session.show(frame)
+        session.report(frames=frames, total=total, repetitions=rep_count)
 
     cap.release()
-    cv2.destroyAllWindows()
 
-    # Salva i dati al termine dell'analisi
-    save_data(data)
-
-# Funzione per aprire la webcam e ottenere feedback in tempo reale
-def analyze_realtime():
-    cap = cv2.VideoCapture(0)
+    # Completa il file della sessione e salva i landmark al termine dell'analisi
+    # (anche se annullata: resta quanto analizzato fino a quel momento)
+    filepath = data.close()
+    save_landmarks(recorder, filepath)
+    # In cache solo le analisi complete
+    if not session.cancelled.is_set():
+        cache.put(key, recorder)
+    save_session(user_id, rep_count, filepath, samples)
+    return {"frames": frames, "repetitions": rep_count, "file": filepath, "cancelled": session.cancelled.is_set()}
+
+# Funzione per aprire la webcam e ottenere feedback in tempo reale. Gira nel thread di
+# session come analyze_video: la pipeline non usa HighGUI e l'anteprima viene mostrata dal
+# thread di Tk; annullando la sessione (o premendo 'q' nell'anteprima) la pipeline si ferma
+def analyze_realtime(user_id, session):
+    import time
+    from realtime_pipeline import RealtimePipeline
+    from pose_analysis import open_session_writer, process_frame, save_landmarks
+    from landmark_store import LandmarkRecorder
+    from adaptive_pose import AdaptivePose
+    from roi_tracking import RoiPose
+
+    realtime_pose = realtime_pose_loader.get()
     rep_count = 0
-    data = []
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame, rep_count, data = process_frame(frame, rep_count, data)
-
-        # Mostra il frame elaborato
-        cv2.imshow("Esercizio in tempo reale", frame)
-
-        # Premi 'q' per uscire dal video
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-    # Salva i dati al termine dell'analisi
-    save_data(data)
-
-# Inizializza MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
-mp_drawing = mp.solutions.drawing_utils
+    # Le righe vengono scritte su disco a blocchi durante la sessione
+    data = open_session_writer()
+    recorder = LandmarkRecorder()
+    samples = SampleRecorder(user_id)
+    # Inferenza completa solo sui keyframe, landmark estrapolati negli altri frame;
+    # sui keyframe il modello vede solo il ritaglio attorno all'atleta
+    roi_pose = RoiPose(realtime_pose)
+    adaptive_pose = AdaptivePose(roi_pose)
+
+    # Stadio di inferenza della pipeline: posa, angolo e ripetizioni
+    def elabora(frame):
+        nonlocal rep_count
+        start = time.perf_counter()
+        frame, rep_count, _ = process_frame(frame, rep_count, data, adaptive_pose, recorder=recorder, samples=samples)
+        report_first_inference(time.perf_counter() - start)
+        return frame
+
+    # Acquisizione e inferenza girano su stadi separati, l'anteprima passa dalla sessione
+    pipeline = RealtimePipeline(0, elabora, "Esercizio in tempo reale")
+
+    def show(frame):
+        session.show(frame)
+        session.report(frames=pipeline.meters["display"].count + 1, total=0, repetitions=rep_count)
+
+    def poll():
+        if session.cancelled.is_set():
+            pipeline.stop()
+
+    pipeline.run_with(show, poll)
+    pipeline.print_stats()
+    adaptive_pose.print_stats()
+    roi_pose.print_stats()
+
+    # Completa il file della sessione e salva i landmark al termine dell'analisi
+    filepath = data.close()
+    save_landmarks(recorder, filepath)
+    save_session(user_id, rep_count, filepath, samples)
+    return {"frames": pipeline.meters["display"].count, "repetitions": rep_count, "file": filepath,
+            "cancelled": session.cancelled.is_set()}
+
+# Inizializza MediaPipe Pose e lo riscalda su una persona disegnata: la prima inferenza
+# vera non paga la creazione del grafo né l'avvio del modello dei landmark
+def create_pose():
+    from pose_analysis import mp_pose
+
+    return warm_up_pose(mp_pose.Pose())
+
+# Pose per il tempo reale: livello scelto con un breve benchmark dell'host, dopo che
+# il Pose dell'analisi video è pronto (i due caricamenti non si contendono la CPU)
+def create_realtime_pose():
+    from pose_tiers import TieredPose, select_tier
+
+    pose_loader.wait()
+    pose = warm_up_pose(TieredPose(select_tier()))
+    # Le latenze del riscaldamento non contano per il cambio di livello
+    pose.latencies.clear()
+    return pose
+
+pose_loader = BackgroundLoader("Pose", create_pose)
+realtime_pose_loader = BackgroundLoader("Pose tempo reale", create_realtime_pose)
 
 # Interfaccia utente principale
 class PalestraAIApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Palestra AI")
-        self.root.geometry("400x300")
+        self.root.geometry("400x380")
+        self.user = None
 
         # Schermata di login
         self.show_login_screen()
@@ -231,8 +221,8 @@ class PalestraAIApp:
     def login(self):
         email = self.email_entry.get()
         password = self.password_entry.get()
-        user = login_user(email, password)
-        if user:
+        self.user = login_user(email, password)
+        if self.user:
             messagebox.showinfo("Login effettuato", "Benvenuto!")
             self.show_main_screen()
         else:
@@ -243,17 +233,68 @@ class PalestraAIApp:
             widget.destroy()
 
         tk.Label(self.root, text="Palestra AI", font=("Helvetica", 16)).pack(pady=10)
-        tk.Button(self.root, text="Analisi Video", command=self.load_video).pack(pady=5)
-        tk.Button(self.root, text="Analisi in Tempo Reale", command=analyze_realtime).pack(pady=5)
+        self.video_button = tk.Button(self.root, text="Analisi Video", command=self.load_video)
+        self.video_button.pack(pady=5)
+        self.realtime_button = tk.Button(self.root, text="Analisi in Tempo Reale", command=self.start_realtime)
+        self.realtime_button.pack(pady=5)
+        self.cancel_button = tk.Button(self.root, text="Annulla analisi", command=self.cancel_analysis, state=tk.DISABLED)
+        self.cancel_button.pack(pady=5)
+        self.status_label = tk.Label(self.root, text="")
+        self.status_label.pack(pady=5)
         tk.Button(self.root, text="Esci", command=self.root.quit).pack(pady=10)
+        self.session = None
 
     def load_video(self):
         video_path = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4 *.avi")])
-        if video_path:
-            analyze_video(video_path)
-
-# Avvio del programma
+        if not video_path:
+            return
+        user_id = self.user[0]
+        self.start_session(lambda session: analyze_video(video_path, user_id, session), "Esercizio")
+
+    def start_realtime(self):
+        user_id = self.user[0]
+        self.start_session(lambda session: analyze_realtime(user_id, session), "Esercizio in tempo reale")
+
+    # L'analisi gira in un thread: la finestra resta reattiva per tutta la durata.
+    # Una sessione alla volta: i pulsanti di avvio restano disattivati finché è in corso
+    def start_session(self, target, window_name):
+        self.set_running(True)
+        self.status_label.config(text="Analisi in corso...")
+        self.session = AnalysisSession(self.root, target, on_progress=self.show_progress, on_done=self.analysis_done,
+                                       on_error=self.analysis_failed, window_name=window_name).start()
+
+    def set_running(self, running):
+        state = tk.DISABLED if running else tk.NORMAL
+        self.video_button.config(state=state)
+        self.realtime_button.config(state=state)
+        self.cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+
+    def cancel_analysis(self):
+        if self.session is not None:
+            self.session.cancel()
+            self.status_label.config(text="Annullamento in corso...")
+
+    def show_progress(self, progress):
+        text = f"Frame {progress['frames']}"
+        if progress["total"] > 0:
+            text += f"/{progress['total']} ({100 * progress['frames'] / progress['total']:.0f}%)"
+        self.status_label.config(text=f"{text} - Ripetizioni: {progress['repetitions']}")
+
+    def analysis_done(self, result):
+        self.set_running(False)
+        outcome = "annullata" if result["cancelled"] else "completata"
+        self.status_label.config(text=f"Analisi {outcome}: {result['repetitions']} ripetizioni in {result['frames']} frame")
+
+    def analysis_failed(self, error):
+        self.set_running(False)
+        self.status_label.config(text="")
+        messagebox.showerror("Errore", f"Analisi non riuscita: {error}")
+
+# Avvio del programma: i caricamenti partono mentre l'utente inserisce le credenziali
 initialize_db()
+pose_loader.start()
+realtime_pose_loader.start()
 root = tk.Tk()
 app = PalestraAIApp(root)
+report_first_window(root)
 root.mainloop()
@@ -0,0 +1,283 @@
+import argparse
+import math
+import multiprocessing
+import queue
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from landmark_store import LandmarkRecorder
+from realtime_pipeline import StageMeter
+
+# Dimensione delle anteprime nel mosaico
+TILE_SIZE = (480, 360)
+
+# Frame accumulati nel worker prima di inviarli al processo principale
+CHUNK_FRAMES = 30
+
+
+# Sorgente da riga di comando: un numero è l'indice di una telecamera, altrimenti un file
+def parse_source(source):
+    return int(source) if isinstance(source, str) and source.isdigit() else source
+
+
+# Legge (o con grab=True salta) il frame successivo; con loop il file ricomincia da capo
+def _next_frame(cap, loop, grab=False):
+    ok = cap.grab() if grab else None
+    ret, frame = (ok, None) if grab else cap.read()
+    if not ret and loop:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        ret, frame = (cap.grab(), None) if grab else cap.read()
+    return ret, frame
+
+
+# Processo di una sorgente: acquisizione, Pose e regole di process_frame. Ogni chunk_frames
+# frame invia al processo principale landmark, timestamp e righe del CSV; le anteprime
+# passano da una coda di un solo elemento e vengono scartate se il mosaico è indietro.
+# Con pace un file simula una telecamera: va alla sua velocità e perde i frame arretrati.
+def _camera_worker(index, source, pose_config, loop, pace, chunk_frames, results, previews, stop):
+    from pose_analysis import mp_pose, process_frame
+
+    # Un processo per sorgente: i thread interni di OpenCV si contenderebbero i core
+    cv2.setNumThreads(1)
+    if previews is not None:
+        # All'uscita l'ultima anteprima non ancora letta può essere persa
+        previews.cancel_join_thread()
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        results.put(("error", index, f"Impossibile aprire la sorgente {source}"))
+        return
+    live = isinstance(source, int)
+    if live:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    pose = mp_pose.Pose(**pose_config)
+    meter = StageMeter()
+    rep_count = 0
+    frames = 0
+    read = 0
+    skipped = 0
+    data = []
+    recorder = LandmarkRecorder(chunk_frames)
+
+    def send_chunk():
+        _, timestamps, landmarks = recorder.view()
+        results.put(("chunk", index, timestamps, landmarks, data, rep_count))
+
+    start = time.perf_counter()
+    try:
+        while not stop.is_set():
+            if pace and not live:
+                due = start + read / fps
+                now = time.perf_counter()
+                if due > now:
+                    time.sleep(due - now)
+                else:
+                    late = int((now - due) * fps)
+                    for _ in range(late):
+                        if not _next_frame(cap, loop, grab=True)[0]:
+                            break
+                    read += late
+                    skipped += late
+            ret, frame = _next_frame(cap, loop)
+            if not ret:
+                break
+            read += 1
+
+            frame, rep_count, data = process_frame(frame, rep_count, data, pose, draw=previews is not None,
+                                                   recorder=recorder)
+            frames += 1
+            meter.tick()
+            if len(recorder) >= chunk_frames:
+                send_chunk()
+                recorder = LandmarkRecorder(chunk_frames)
+                data = []
+
+            if previews is not None:
+                tile = cv2.resize(frame, TILE_SIZE, interpolation=cv2.INTER_AREA)
+                cv2.putText(tile, f"{index}: {meter.fps():.0f} fps - Ripetizioni: {rep_count}", (10, TILE_SIZE[1] - 15),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+                try:
+                    previews.put_nowait(tile)
+                except queue.Full:
+                    meter.drop()
+        if len(recorder):
+            send_chunk()
+    except Exception as exc:
+        results.put(("error", index, str(exc)))
+    finally:
+        cap.release()
+        pose.close()
+    seconds = time.perf_counter() - start
+    results.put(("done", index, {"frames": frames, "repetitions": rep_count, "seconds": seconds,
+                                 "fps": frames / seconds if seconds > 0 else 0.0, "skipped": skipped,
+                                 "previews_dropped": meter.dropped}))
+
+
+# Analisi di più sorgenti contemporanee (telecamere o video che le simulano): un processo
+# con il proprio Pose per sorgente, così il throughput cresce con i core. Il processo
+# principale raccoglie i risultati in un CSV e una serie di landmark per sorgente e
+# mostra le anteprime in un unico mosaico (HighGUI resta sul thread principale).
+# Con user_id le righe di ogni sorgente vanno anche in session_samples, per il riepilogo del report.
+class MultiCamera:
+    def __init__(self, sources, pose_config=None, loop=False, pace=True, display=True, chunk_frames=CHUNK_FRAMES,
+                 output_dir=None, user_id=None):
+        self.sources = [parse_source(source) for source in sources]
+        self.pose_config = pose_config or {}
+        self.loop = loop
+        self.pace = pace
+        self.display = display
+        self.chunk_frames = chunk_frames
+        self.output_dir = output_dir
+        self.user_id = user_id
+        self.window_name = "Multi-camera"
+        self.streams = []
+        self._processes = []
+        self._context = multiprocessing.get_context("spawn")
+        self._results = self._context.Queue()
+        self._stop = self._context.Event()
+
+    def start(self):
+        from database import SampleRecorder
+        from pose_analysis import open_session_writer
+
+        for index, source in enumerate(self.sources):
+            previews = self._context.Queue(maxsize=1) if self.display else None
+            process = self._context.Process(target=_camera_worker, name=f"camera-{index}",
+                                            args=(index, source, self.pose_config, self.loop, self.pace,
+                                                  self.chunk_frames, self._results, previews, self._stop))
+            process.start()
+            self._processes.append(process)
+            self.streams.append({"source": source, "previews": previews, "tile": None, "repetitions": 0,
+                                 "writer": open_session_writer(self.output_dir, suffix=f"cam{index}"),
+                                 "recorder": LandmarkRecorder(), "stats": None, "error": None,
+                                 "samples": SampleRecorder(self.user_id) if self.user_id is not None else None})
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _handle(self, message):
+        kind, index = message[:2]
+        stream = self.streams[index]
+        if kind == "chunk":
+            _, _, timestamps, landmarks, rows, repetitions = message
+            for timestamp, frame_landmarks in zip(timestamps, landmarks):
+                stream["recorder"].append(frame_landmarks, timestamp=timestamp)
+            for row in rows:
+                stream["writer"].append(row)
+                if stream["samples"] is not None:
+                    stream["samples"].record(*row)
+            stream["repetitions"] = repetitions
+        elif kind == "done":
+            stream["stats"] = message[2]
+        else:
+            stream["error"] = message[2]
+            print(f"Sorgente {stream['source']}: {message[2]}")
+
+    def _drain(self, timeout=0.0):
+        try:
+            self._handle(self._results.get(timeout=timeout) if timeout else self._results.get_nowait())
+            while True:
+                self._handle(self._results.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _mosaic(self):
+        for stream in self.streams:
+            try:
+                stream["tile"] = stream["previews"].get_nowait()
+            except queue.Empty:
+                pass
+        blank = np.zeros((TILE_SIZE[1], TILE_SIZE[0], 3), dtype=np.uint8)
+        tiles = [stream["tile"] if stream["tile"] is not None else blank for stream in self.streams]
+        columns = math.ceil(math.sqrt(len(tiles)))
+        tiles += [blank] * (-len(tiles) % columns)
+        return np.vstack([np.hstack(tiles[row:row + columns]) for row in range(0, len(tiles), columns)])
+
+    # Ciclo principale: raccoglie i risultati e aggiorna il mosaico finché le sorgenti sono
+    # attive, per al massimo seconds secondi (None = fino a 'q' o alla fine dei video)
+    def run(self, seconds=None):
+        if not self._processes:
+            self.start()
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        while any(process.is_alive() for process in self._processes):
+            if deadline is not None and time.perf_counter() >= deadline:
+                self.stop()
+            if self._stop.is_set():
+                break
+            if self.display:
+                self._drain()
+                cv2.imshow(self.window_name, self._mosaic())
+                if cv2.waitKey(15) & 0xFF == ord('q'):
+                    self.stop()
+            else:
+                self._drain(timeout=0.1)
+        return self.finish()
+
+    # Ferma i processi, raccoglie gli ultimi risultati e chiude i file delle sessioni
+    def finish(self):
+        self.stop()
+        # I processi escono solo dopo che i loro messaggi sono stati letti
+        while any(stream["stats"] is None and stream["error"] is None for stream in self.streams):
+            if not any(process.is_alive() for process in self._processes) and self._results.empty():
+                break
+            self._drain(timeout=0.1)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            # Un worker bloccato (ad esempio su una telecamera che non risponde) non deve
+            # impedire di chiudere le altre sessioni
+            if process.is_alive():
+                print(f"{process.name} non risponde, terminato")
+                process.terminate()
+                process.join()
+        if self.display:
+            cv2.destroyWindow(self.window_name)
+
+        from pose_analysis import save_landmarks
+        summary = []
+        for stream in self.streams:
+            filepath = stream["writer"].close()
+            save_landmarks(stream["recorder"], filepath)
+            stats = stream["stats"] or {}
+            session_id = stream["samples"].close() if stream["samples"] is not None else None
+            summary.append({"source": stream["source"], "file": filepath, "repetitions": stream["repetitions"],
+                            "frames": len(stream["recorder"]), "fps": stats.get("fps", 0.0),
+                            "skipped": stats.get("skipped", 0), "error": stream["error"], "session_id": session_id})
+        return summary
+
+
+def print_summary(summary):
+    for index, stream in enumerate(summary):
+        print(f"Sorgente {index} ({stream['source']}): {stream['frames']} frame, {stream['fps']:.1f} fps, "
+              f"{stream['repetitions']} ripetizioni, {stream['skipped']} frame persi -> {stream['file']}")
+    print(f"Totale: {sum(stream['fps'] for stream in summary):.1f} fps su {len(summary)} sorgenti")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analisi in tempo reale di più telecamere, un processo per sorgente")
+    parser.add_argument("sources", nargs="+", help="indici delle telecamere (0, 1, ...) o video che le simulano")
+    parser.add_argument("--loop", action="store_true", help="ripeti i video all'infinito")
+    parser.add_argument("--no-pace", action="store_true", help="elabora i video alla massima velocità")
+    parser.add_argument("--no-display", action="store_true", help="nessuna finestra di anteprima")
+    parser.add_argument("--seconds", type=float, default=None, help="durata massima dell'analisi")
+    parser.add_argument("-o", "--output-dir", default=None)
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--user-id", type=int, default=None, help="registra un report per sorgente nel database")
+    args = parser.parse_args(argv)
+
+    multi = MultiCamera(args.sources, {"model_complexity": args.model_complexity}, args.loop, not args.no_pace,
+                        not args.no_display, output_dir=args.output_dir, user_id=args.user_id)
+    summary = multi.run(args.seconds)
+    print_summary(summary)
+    if args.user_id is not None:
+        from database import save_report
+        for stream in summary:
+            save_report(args.user_id, datetime.now().strftime('%Y%m%d_%H%M%S'), stream["repetitions"], stream["file"],
+                        stream["session_id"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import math
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import cv2
+import mediapipe as mp
+import numpy as np
+import pandas as pd
+from mediapipe.framework.formats import landmark_pb2
+
+from joint_angles import frame_angles, joint_angles, landmarks_to_array
+from landmark_store import LandmarkRecorder, save_series
+from pose_cache import cache_key
+from session_writer import SessionWriter
+
+# Oggetti MediaPipe condivisi da GUI, analisi batch e worker
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+# Colonne dei file analysis_*.csv
+CSV_COLUMNS = ["Timestamp", "Repetitions", "Back-Thigh Angle"]
+
+# Risultato compatibile con quello di pose.process(), usato dai wrapper di Pose
+PoseResult = namedtuple("PoseResult", ["pose_landmarks"])
+
+
+# Converte un array (33, 4) nei landmark normalizzati di MediaPipe (per disegno e regole)
+def landmarks_from_array(array):
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in array.tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
+
+
+# Percorso del file analysis_* di una sessione (il suffisso evita collisioni tra analisi parallele)
+def analysis_path(directory=None, suffix=None, extension=".csv"):
+    filename = f"analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if suffix:
+        filename += f"_{suffix}"
+    return os.path.join(directory or os.getcwd(), filename + extension)
+
+
+# Scrittore in streaming per una nuova sessione: si usa al posto della lista data.
+# fmt "csv" produce analysis_*.csv, fmt "npz" una cartella analysis_*.chunks di blocchi NumPy
+def open_session_writer(directory=None, fmt="csv", suffix=None):
+    extension = ".csv" if fmt == "csv" else ".chunks"
+    return SessionWriter(analysis_path(directory, suffix, extension), CSV_COLUMNS, fmt)
+
+
+# Funzione per salvare i dati in CSV
+def save_data(data, directory=None, suffix=None):
+    filepath = analysis_path(directory, suffix)
+    df = pd.DataFrame(data, columns=CSV_COLUMNS)
+    df.to_csv(filepath, index=False)
+    print(f"File salvato: {filepath}")
+    return filepath
+
+
+# Salva i landmark della sessione accanto al CSV (analysis_..._landmarks/)
+def save_landmarks(recorder, csv_path):
+    return recorder.save(landmarks_path(csv_path))
+
+
+# Cartella dei landmark accanto al CSV di una sessione
+def landmarks_path(csv_path):
+    return os.path.splitext(csv_path)[0] + "_landmarks"
+
+
+# Orari HH:MM:SS dei timestamp di sistema (time.time) di una serie
+def clock_times(timestamps):
+    return [datetime.fromtimestamp(timestamp).strftime('%H:%M:%S') for timestamp in timestamps.tolist()]
+
+
+# Angolo schiena-femore (spalla-anca-ginocchio sinistri) per una serie (N, 33, C) di landmark
+def back_thigh_angles(landmarks):
+    return joint_angles(landmarks, ("back_thigh_left",))[:, 0]
+
+
+# Soglia dell'angolo schiena-femore sotto la quale viene contata una ripetizione
+REP_ANGLE_THRESHOLD = 70
+
+
+# Controllo ripetizioni in base all'angolo (stessa regola per analisi seriale e a segmenti)
+def count_repetition(back_thigh_angle, rep_count, threshold=REP_ANGLE_THRESHOLD):
+    if back_thigh_angle < threshold:
+        rep_count += 1
+    return rep_count
+
+
+# Applica angoli e conteggio a una serie (N, 33, 4) di landmark già estratti.
+# timestamps: orari HH:MM:SS per frame; se assenti si usa l'ora corrente.
+def analyze_landmarks(landmarks, timestamps=None, threshold=REP_ANGLE_THRESHOLD):
+    angles = back_thigh_angles(landmarks)
+    if timestamps is None:
+        timestamps = [datetime.now().strftime('%H:%M:%S')] * len(angles)
+    rep_count = 0
+    data = []
+    for timestamp, angle in zip(timestamps, angles):
+        if np.isnan(angle):
+            continue
+        rep_count = count_repetition(angle, rep_count, threshold)
+        data.append([timestamp, rep_count, angle])
+    return rep_count, data
+
+
+# Applica le regole di process_frame a una serie già estratta (frames, timestamps, landmarks)
+# con timestamp di sistema, senza decodifica né inferenza: righe in data e serie per frame
+# in samples come se il video fosse stato analizzato frame per frame
+def replay_landmarks(series, data, samples=None, threshold=REP_ANGLE_THRESHOLD):
+    _, timestamps, landmarks = series
+    angles = joint_angles(landmarks, ("back_thigh_left", "knee_left")).tolist()
+    rep_count = 0
+    for timestamp, (back_thigh_angle, knee_angle) in zip(clock_times(timestamps), angles):
+        # Frame senza posa
+        if math.isnan(back_thigh_angle):
+            back_thigh_angle = knee_angle = None
+        else:
+            rep_count = count_repetition(back_thigh_angle, rep_count, threshold)
+            data.append([timestamp, rep_count, back_thigh_angle])
+        if samples is not None:
+            samples.record(timestamp, rep_count, back_thigh_angle, knee_angle)
+    return rep_count, data
+
+
+# Stima della posa da un frame BGR. I wrapper di Pose che definiscono process_bgr
+# (ritaglio ROI, inferenza adattiva) convertono in RGB solo la parte che serve.
+def detect_pose(pose, frame):
+    if hasattr(pose, "process_bgr"):
+        return pose.process_bgr(frame)
+    return pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+# Funzione per elaborare ogni frame e rilevare la posa
+def process_frame(frame, rep_count, data, pose, draw=True, recorder=None, samples=None):
+    result = detect_pose(pose, frame)
+    back_thigh_angle = None
+    knee_angle = None
+    landmarks = None
+
+    if result.pose_landmarks:
+        landmarks = result.pose_landmarks.landmark
+
+    # Registra tutti i 33 landmark del frame (NaN se la posa non è rilevata)
+    if recorder is not None:
+        recorder.append(None if landmarks is None else landmarks_to_array(landmarks))
+
+    if landmarks is not None:
+        if draw:
+            mp_drawing.draw_landmarks(frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+        back_thigh_angle, knee_angle = frame_angles(landmarks, ("back_thigh_left", "knee_left"))
+
+        # Mostra angolo sul video
+        if draw:
+            cv2.putText(frame, f"Angolo: {int(back_thigh_angle)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        previous_count = rep_count
+        rep_count = count_repetition(back_thigh_angle, rep_count)
+        if draw and rep_count != previous_count:
+            cv2.putText(frame, f"Ripetizioni: {rep_count}", (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        # Salva dati per ogni ripetizione
+        data.append([datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle])
+
+    # Serie per frame della sessione nel database (session_samples)
+    if samples is not None:
+        samples.record(datetime.now().strftime('%H:%M:%S'), rep_count, back_thigh_angle, knee_angle)
+
+    return frame, rep_count, data
+
+
+# Decodifica il video ed estrae i landmark di ogni frame (solo inferenza, nessuna regola).
+# I timestamp sono orari di sistema: restano validi quando la serie viene riletta dalla cache.
+def extract_landmarks(video_path, pose):
+    cap = cv2.VideoCapture(video_path)
+    recorder = LandmarkRecorder(clock=time.time)
+
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = pose.process(rgb_frame)
+        landmarks = None
+        if result.pose_landmarks:
+            landmarks = landmarks_to_array(result.pose_landmarks.landmark)
+        recorder.append(landmarks)
+
+    cap.release()
+    return recorder, clock_times(recorder.view()[1])
+
+
+# Analisi di un video senza finestre né attese: restituisce un riepilogo dell'elaborazione.
+# Con una PoseCache i landmark già estratti per lo stesso video e la stessa configurazione
+# di Pose vengono riletti dalla cache, saltando decodifica e inferenza.
+def analyze_video_file(video_path, pose, output_dir=None, cache=None, pose_config=None,
+                       threshold=REP_ANGLE_THRESHOLD):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    series = None
+    if cache is not None:
+        key = cache_key(video_path, pose_config)
+        series = cache.get(key)
+
+    cached = series is not None
+    if not cached:
+        recorder, _ = extract_landmarks(video_path, pose)
+        series = recorder.view()
+        if cache is not None:
+            cache.put(key, recorder)
+
+    _, timestamps, landmarks = series
+    rep_count, data = analyze_landmarks(landmarks, clock_times(timestamps), threshold)
+    suffix = os.path.splitext(os.path.basename(video_path))[0]
+    filepath = save_data(data, output_dir, suffix)
+    # I landmark vengono sempre conservati accanto al CSV, anche se riletti dalla cache
+    save_series(landmarks_path(filepath), *series)
+    return {"video": video_path, "frames": len(landmarks), "repetitions": rep_count, "csv": filepath,
+            "cached": cached}
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import mediapipe as mp
+
+from landmark_store import load_landmarks
+
+# Parametri di MediaPipe Pose che influenzano i landmark estratti, con i valori di default
+POSE_DEFAULTS = {
+    "static_image_mode": False,
+    "model_complexity": 1,
+    "smooth_landmarks": True,
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+}
+
+# Dimensione massima di default della cache su disco (2 GB)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+# Cartella di default della cache dei landmark per l'interfaccia grafica
+DEFAULT_CACHE_DIR = "cache_landmark"
+
+# Byte letti all'inizio e alla fine del video per calcolarne l'impronta
+FINGERPRINT_BYTES = 1024 * 1024
+
+
+# Impronta del video senza leggerlo tutto: dimensione più SHA-256 del primo e dell'ultimo
+# blocco (intestazione e indice del contenitore cambiano se il video viene modificato)
+def video_fingerprint(video_path, block_size=FINGERPRINT_BYTES):
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(video_path, "rb") as f:
+        digest.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(size - block_size, block_size))
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+# Chiave della cache: impronta del video + configurazione di Pose + versione di MediaPipe
+def cache_key(video_path, pose_config=None):
+    config = dict(POSE_DEFAULTS, **(pose_config or {}))
+    config["mediapipe"] = mp.__version__
+    payload = video_fingerprint(video_path) + json.dumps(config, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Dimensione in byte di una voce della cache
+def _entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+# Cache su disco delle serie di landmark, indirizzata per contenuto. Ogni voce è una
+# cartella con i .npy di LandmarkRecorder (timestamp come orario di sistema, vedi
+# extract_landmarks); la data di modifica della cartella segna
+# l'ultimo accesso e le voci meno usate di recente vengono rimosse oltre max_bytes.
+class PoseCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    # Restituisce (frames, timestamps, landmarks) in memory-map, oppure None se assente
+    def get(self, key):
+        path = self._path(key)
+        try:
+            series = load_landmarks(path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        return series
+
+    # Salva una serie: scrittura in una cartella temporanea e rinomina atomica
+    def put(self, key, recorder):
+        path = self._path(key)
+        tmp = tempfile.mkdtemp(prefix=".tmp_", dir=self.directory)
+        recorder.save(tmp)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            # Un altro processo ha già salvato la stessa voce
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+        return path
+
+    # Rimuove le voci usate meno di recente finché la cache non rientra in max_bytes
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and not entry.name.startswith(".tmp_"):
+                entries.append((entry.stat().st_mtime, _entry_size(entry.path), entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+        return total
@@ -0,0 +1,133 @@
+import time
+from collections import deque
+
+import cv2
+
+from pose_analysis import mp_pose
+from synthetic_subject import squat_frames
+
+# Livelli di prestazione, dal più accurato al più leggero. Con una persona nel frame il costo
+# è dominato dal modello dei landmark, che lavora su un ritaglio 256x256: la riduzione del
+# frame da sola non rende un livello più veloce (misurato: 29 ms a 640x480 e 32 ms a 1280x720
+# con e senza downscale 0.5 per model_complexity 1), quindi ogni livello cambia il modello.
+TIERS = [
+    {"model_complexity": 2, "downscale": 1.0, "smooth_landmarks": True},
+    {"model_complexity": 1, "downscale": 1.0, "smooth_landmarks": True},
+    {"model_complexity": 0, "downscale": 0.5, "smooth_landmarks": True},
+    {"model_complexity": 0, "downscale": 0.5, "smooth_landmarks": False},
+]
+
+# FPS minimi richiesti di default per l'analisi in tempo reale
+DEFAULT_TARGET_FPS = 25
+
+
+# Crea l'istanza di MediaPipe Pose per un livello
+def create_tier_pose(tier):
+    return mp_pose.Pose(model_complexity=tier["model_complexity"], smooth_landmarks=tier["smooth_landmarks"])
+
+
+# Riduce il frame secondo il fattore del livello (le coordinate normalizzate non cambiano)
+def downscale(frame, factor):
+    if factor >= 1.0:
+        return frame
+    return cv2.resize(frame, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+
+# Frame RGB di prova: una persona disegnata che fa squat. Su frame senza persone (rumore,
+# frame vuoti) MediaPipe esegue solo il detector e tutti i livelli sembrerebbero uguali.
+def benchmark_frames(count=12, width=640, height=480):
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in squat_frames(count, width=width, height=height)]
+
+
+# Latenza media (s) di un livello sui frame RGB di prova, escluso il primo frame, e numero
+# di frame in cui è stata rilevata una posa (0 = misurato solo il detector)
+def benchmark_tier(tier, frames):
+    pose = create_tier_pose(tier)
+    try:
+        pose.process(downscale(frames[0], tier["downscale"]))
+        detected = 0
+        start = time.perf_counter()
+        for frame in frames[1:]:
+            if pose.process(downscale(frame, tier["downscale"])).pose_landmarks:
+                detected += 1
+        return (time.perf_counter() - start) / max(1, len(frames) - 1), detected
+    finally:
+        pose.close()
+
+
+# Sceglie il livello più alto che rispetta target_fps sull'host corrente. I frame di prova
+# devono contenere una persona: i livelli in cui non viene rilevata non sono confrontabili e
+# vengono segnalati, così come un livello più leggero che non risulta più veloce.
+def select_tier(target_fps=DEFAULT_TARGET_FPS, frames=None):
+    frames = frames or benchmark_frames()
+    budget = 1.0 / target_fps
+    previous = None
+    available = len(TIERS) - 1
+    for index, tier in enumerate(TIERS):
+        try:
+            latency, detected = benchmark_tier(tier, frames)
+        except (OSError, RuntimeError) as exc:
+            # Modello del livello non disponibile (es. non scaricabile senza rete)
+            print(f"Livello {index} non disponibile: {exc}")
+            continue
+        print(f"Livello {index}: {1.0 / latency:.1f} fps, posa rilevata in {detected}/{len(frames) - 1} frame")
+        if not detected:
+            print(f"Livello {index}: nessuna persona nei frame di prova, misurato solo il detector")
+        elif previous is not None and latency > 0.9 * previous:
+            print(f"Livello {index}: non più veloce del livello precedente ({latency * 1e3:.1f} ms "
+                  f"contro {previous * 1e3:.1f} ms)")
+        available = index
+        if latency <= budget:
+            return index
+        if detected:
+            previous = latency
+    return available
+
+
+# Pose con livello di prestazione: applica complessità, riduzione e smoothing del livello e
+# scende automaticamente di un livello quando la latenza media sulle ultime window
+# inferenze supera il budget (1 / target_fps)
+class TieredPose:
+    def __init__(self, tier_index=0, target_fps=DEFAULT_TARGET_FPS, window=30):
+        self.tier_index = tier_index
+        self.budget = 1.0 / target_fps
+        self.latencies = deque(maxlen=window)
+        self.pose = create_tier_pose(TIERS[tier_index])
+
+    @property
+    def tier(self):
+        return TIERS[self.tier_index]
+
+    def process(self, rgb_frame):
+        start = time.perf_counter()
+        result = self.pose.process(downscale(rgb_frame, self.tier["downscale"]))
+        self._record(time.perf_counter() - start)
+        return result
+
+    # Su frame BGR la riduzione avviene prima della conversione, così si converte meno
+    def process_bgr(self, frame):
+        start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(downscale(frame, self.tier["downscale"]), cv2.COLOR_BGR2RGB)
+        result = self.pose.process(rgb_frame)
+        self._record(time.perf_counter() - start)
+        return result
+
+    def _record(self, latency):
+        self.latencies.append(latency)
+        if len(self.latencies) == self.latencies.maxlen and self.tier_index < len(TIERS) - 1:
+            if sum(self.latencies) / len(self.latencies) > self.budget:
+                self.step_down()
+
+    def step_down(self):
+        self.pose.close()
+        self.tier_index += 1
+        self.pose = create_tier_pose(self.tier)
+        self.latencies.clear()
+        print(f"Latenza oltre il budget: passaggio al livello {self.tier_index} {self.tier}")
+
+    def reset(self):
+        self.pose.reset()
+        self.latencies.clear()
+
+    def close(self):
+        self.pose.close()
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+from collections import deque
+
+# Segnale di fine flusso tra uno stadio e il successivo
+_END = object()
+
+
+# OpenCV viene importato solo da acquisizione e finestra: put_latest e StageMeter servono
+# anche a moduli caricati prima della finestra di Tk, che non devono pagare l'import di cv2
+
+# Inserisce un elemento in una coda limitata scartando il più vecchio se piena
+def put_latest(q, item):
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+# Misura la frequenza (FPS) di uno stadio su una finestra mobile di frame
+class StageMeter:
+    def __init__(self, window=60):
+        self._times = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.dropped = 0
+
+    def tick(self):
+        with self._lock:
+            self._times.append(time.perf_counter())
+            self.count += 1
+
+    def drop(self, n=1):
+        with self._lock:
+            self.dropped += n
+
+    def fps(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            span = self._times[-1] - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+# Pipeline a stadi per la webcam: acquisizione -> inferenza -> visualizzazione.
+# L'acquisizione gira in un thread che tiene solo il frame più recente, l'inferenza
+# in un secondo thread e la visualizzazione (cv2.imshow) sul thread chiamante.
+class RealtimePipeline:
+    def __init__(self, source, process, window_name, capture_queue_size=1, display_queue_size=2):
+        self.source = source
+        self.process = process
+        self.window_name = window_name
+        self.capture_queue = queue.Queue(maxsize=capture_queue_size)
+        self.display_queue = queue.Queue(maxsize=display_queue_size)
+        self.meters = {"capture": StageMeter(), "inference": StageMeter(), "display": StageMeter()}
+        self.latencies = deque(maxlen=120)
+        self._stop = threading.Event()
+        self._threads = []
+        self.error = None
+
+    # Stadio di acquisizione: legge continuamente e scarta i frame non ancora elaborati
+    def _capture_loop(self):
+        import cv2
+
+        cap = cv2.VideoCapture(self.source)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        meter = self.meters["capture"]
+        try:
+            while cap.isOpened() and not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                meter.tick()
+                meter.drop(put_latest(self.capture_queue, (time.perf_counter(), frame)))
+        finally:
+            cap.release()
+            put_latest(self.capture_queue, _END)
+
+    # Stadio di inferenza: posa, angoli, disegno e conteggio tramite la funzione fornita.
+    # La fine del flusso arriva sempre alla visualizzazione, anche se process solleva
+    # un'eccezione: l'errore viene conservato e rilanciato da run().
+    def _inference_loop(self):
+        meter = self.meters["inference"]
+        try:
+            while True:
+                item = self.capture_queue.get()
+                if item is _END:
+                    break
+                captured_at, frame = item
+                frame = self.process(frame)
+                meter.tick()
+                meter.drop(put_latest(self.display_queue, (captured_at, frame)))
+                if self._stop.is_set():
+                    break
+        except Exception as exc:
+            self.error = exc
+            self._stop.set()
+        finally:
+            put_latest(self.display_queue, _END)
+
+    def start(self):
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="acquisizione", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inferenza", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # Stadio di visualizzazione: resta sul thread principale come richiesto da highgui
+    def run(self):
+        import cv2
+
+        return self.run_with(lambda frame: cv2.imshow(self.window_name, frame), self._poll_keys,
+                             cv2.destroyAllWindows)
+
+    # Premi 'q' nella finestra per fermare la pipeline
+    def _poll_keys(self):
+        import cv2
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.stop()
+
+    # Stadio di visualizzazione con funzioni fornite dal chiamante: show riceve ogni frame
+    # elaborato, poll viene chiamata dopo ogni frame e durante le attese (tasti,
+    # annullamento), close alla fine. Senza HighGUI può girare su qualsiasi thread, ad
+    # esempio nel worker di un'AnalysisSession che mostra i frame dal thread di Tk.
+    def run_with(self, show, poll=None, close=None):
+        self.start()
+        meter = self.meters["display"]
+        while True:
+            try:
+                item = self.display_queue.get(timeout=0.1)
+            except queue.Empty:
+                if poll is not None:
+                    poll()
+                continue
+            if item is _END:
+                break
+            captured_at, frame = item
+            show(frame)
+            self.latencies.append(time.perf_counter() - captured_at)
+            meter.tick()
+            if poll is not None:
+                poll()
+
+        # L'inferenza deve essere terminata prima che il chiamante salvi i dati della sessione;
+        # l'acquisizione può restare bloccata sulla telecamera e non tocca i dati
+        capture, inference = self._threads
+        inference.join()
+        capture.join(timeout=2.0)
+        if close is not None:
+            close()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+    # Statistiche per stadio: FPS, frame scartati e latenza acquisizione -> schermo
+    def stats(self):
+        latencies = sorted(self.latencies)
+        stats = {name: {"fps": meter.fps(), "frames": meter.count, "dropped": meter.dropped}
+                 for name, meter in self.meters.items()}
+        stats["latency_ms"] = {
+            "mean": 1000.0 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95": 1000.0 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        }
+        return stats
+
+    def print_stats(self):
+        stats = self.stats()
+        for name in ("capture", "inference", "display"):
+            stage = stats[name]
+            print(f"{name}: {stage['fps']:.1f} fps, {stage['frames']} frame, {stage['dropped']} scartati")
+        print(f"Latenza media: {stats['latency_ms']['mean']:.1f} ms (p95 {stats['latency_ms']['p95']:.1f} ms)")
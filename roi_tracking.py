@@ -0,0 +1,99 @@
+import cv2
+import numpy as np
+
+from joint_angles import landmarks_to_array
+from pose_analysis import PoseResult, landmarks_from_array
+
+# Visibilità minima perché un landmark contribuisca al riquadro dell'atleta
+MIN_VISIBILITY = 0.5
+
+
+# Ritaglio ROI: sostituisce pose senza cambiare l'interfaccia. Usa i landmark del frame
+# precedente per ritagliare un riquadro con margine attorno all'atleta, lo riduce a
+# max_side pixel sul lato lungo e passa al modello solo quello; i landmark vengono poi
+# riportati alle coordinate del frame intero. Se l'atleta non viene trovato nel ritaglio
+# il frame successivo torna a essere elaborato per intero.
+class RoiPose:
+    def __init__(self, pose, padding=0.25, max_side=480, margin=0.1):
+        self.pose = pose
+        self.padding = padding
+        self.max_side = max_side
+        self.margin = margin
+        self.roi = None
+        self.frames = 0
+        self.cropped_frames = 0
+        self.lost = 0
+
+    def process(self, rgb_frame):
+        return self._detect(rgb_frame, convert=False)
+
+    # Come process, ma su frame BGR: viene convertito solo il ritaglio ridotto
+    def process_bgr(self, frame):
+        return self._detect(frame, convert=True)
+
+    def _detect(self, frame, convert):
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi or (0, 0, width, height)
+        crop = frame[y0:y1, x0:x1]
+        scale = min(1.0, self.max_side / max(crop.shape[:2]))
+        if scale < 1.0:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if convert:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+
+        self.frames += 1
+        if self.roi is not None:
+            self.cropped_frames += 1
+        result = self.pose.process(crop)
+
+        if not result.pose_landmarks:
+            if self.roi is not None:
+                self.lost += 1
+            self.roi = None
+            return result
+
+        # Dalle coordinate normalizzate del ritaglio a quelle del frame intero
+        landmarks = landmarks_to_array(result.pose_landmarks.landmark)
+        crop_width, crop_height = x1 - x0, y1 - y0
+        landmarks[:, 0] = (landmarks[:, 0] * crop_width + x0) / width
+        landmarks[:, 1] = (landmarks[:, 1] * crop_height + y0) / height
+        landmarks[:, 2] *= crop_width / width
+        self._update_roi(landmarks, width, height)
+        if (x0, y0, x1, y1) == (0, 0, width, height):
+            return result
+        return PoseResult(landmarks_from_array(landmarks))
+
+    # Aggiorna il riquadro solo quando l'atleta si avvicina al bordo di quello attuale,
+    # così il modello vede un ritaglio stabile tra un frame e l'altro
+    def _update_roi(self, landmarks, width, height):
+        visible = landmarks[landmarks[:, 3] > MIN_VISIBILITY, :2]
+        if len(visible) == 0:
+            self.roi = None
+            return
+        bx0, by0 = visible.min(axis=0) * (width, height)
+        bx1, by1 = visible.max(axis=0) * (width, height)
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            mx, my = self.margin * (x1 - x0), self.margin * (y1 - y0)
+            if bx0 >= x0 + mx and by0 >= y0 + my and bx1 <= x1 - mx and by1 <= y1 - my:
+                return
+        pad = self.padding * max(bx1 - bx0, by1 - by0)
+        roi = (int(max(0, bx0 - pad)), int(max(0, by0 - pad)),
+               int(min(width, np.ceil(bx1 + pad))), int(min(height, np.ceil(by1 + pad))))
+        self.roi = roi if roi[2] > roi[0] and roi[3] > roi[1] else None
+
+    def reset(self):
+        self.pose.reset()
+        self.roi = None
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "cropped_ratio": self.cropped_frames / self.frames if self.frames else 0.0,
+            "lost": self.lost,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"ROI: {stats['cropped_ratio']:.0%} dei frame elaborati sul ritaglio, "
+              f"tracciamento perso {stats['lost']} volte")
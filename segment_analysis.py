@@ -0,0 +1,123 @@
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from joint_angles import NUM_LANDMARKS, landmarks_to_array
+from pose_analysis import analyze_landmarks, mp_pose, save_data
+
+# Frame elaborati prima dell'inizio del segmento per stabilizzare il tracking di MediaPipe
+DEFAULT_WARMUP_FRAMES = 15
+
+
+# Numero di frame del video secondo il container
+def count_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return total
+
+
+# Divide [0, total) in intervalli contigui di frame, uno per segmento
+def split_ranges(total_frames, segments):
+    segments = max(1, min(segments, total_frames))
+    bounds = [round(i * total_frames / segments) for i in range(segments + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments) if bounds[i] < bounds[i + 1]]
+
+
+# Worker: decodifica e stima la posa su [start, end) (end None = fino alla fine del video).
+# Restituisce timestamp e landmark (n, 33, 4) per frame, con NaN dove la posa non è rilevata.
+def analyze_segment(video_path, start, end, warmup=DEFAULT_WARMUP_FRAMES, pose_config=None):
+    pose = mp_pose.Pose(**(pose_config or {}))
+    cap = cv2.VideoCapture(video_path)
+    first = max(0, start - warmup)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    timestamps = []
+    landmarks = []
+    missing = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    index = first
+
+    while end is None or index < end:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = pose.process(rgb_frame)
+        if index >= start:
+            timestamps.append(datetime.now().strftime('%H:%M:%S'))
+            if result.pose_landmarks:
+                landmarks.append(landmarks_to_array(result.pose_landmarks.landmark))
+            else:
+                landmarks.append(missing)
+        index += 1
+
+    cap.release()
+    pose.close()
+    return timestamps, np.array(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+
+
+# Ricompone i segmenti e applica angoli e conteggio in ordine, come l'analisi seriale
+def stitch_segments(segment_results):
+    timestamps = [timestamp for segment_timestamps, _ in segment_results for timestamp in segment_timestamps]
+    landmarks = np.concatenate([segment_landmarks for _, segment_landmarks in segment_results])
+    return analyze_landmarks(landmarks, timestamps)
+
+
+# Analisi di un singolo video lungo suddiviso in segmenti elaborati in parallelo
+def analyze_video_segments(video_path, workers=None, output_dir=None, warmup=DEFAULT_WARMUP_FRAMES, pose_config=None):
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    total_frames = count_frames(video_path)
+    ranges = split_ranges(total_frames, workers) if total_frames > 0 else [(0, None)]
+    # Il conteggio del container può essere approssimato: l'ultimo segmento legge fino alla fine
+    ranges[-1] = (ranges[-1][0], None)
+
+    # spawn: un fork dopo la creazione di un grafo di MediaPipe nel processo padre
+    # corrompe lo stato dei worker (BrokenProcessPool)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(analyze_segment, video_path, start, end, warmup, pose_config)
+                   for start, end in ranges]
+        segment_results = [future.result() for future in futures]
+
+    rep_count, data = stitch_segments(segment_results)
+    suffix = os.path.splitext(os.path.basename(video_path))[0]
+    filepath = save_data(data, output_dir, suffix)
+    return {
+        "video": video_path,
+        "frames": sum(len(timestamps) for timestamps, _ in segment_results),
+        "segments": len(ranges),
+        "repetitions": rep_count,
+        "csv": filepath,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analisi di un video lungo suddiviso in segmenti paralleli")
+    parser.add_argument("video", help="file video da analizzare")
+    parser.add_argument("-o", "--output-dir", default=None, help="cartella per il file analysis_*.csv")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="numero di segmenti/processi")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP_FRAMES,
+                        help="frame di riscaldamento prima di ogni segmento")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.video):
+        print("Errore: Video non trovato. ")
+        return 1
+
+    summary = analyze_video_segments(args.video, args.workers, args.output_dir, args.warmup)
+    print(f"{summary['video']}: {summary['frames']} frame in {summary['segments']} segmenti, "
+          f"{summary['repetitions']} ripetizioni in {summary['seconds']:.1f} s "
+          f"({summary['frames'] / summary['seconds']:.1f} frame/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
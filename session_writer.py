@@ -0,0 +1,128 @@
+import csv
+import glob
+import os
+import queue
+import re
+import shutil
+import threading
+
+import numpy as np
+
+# Segnale di chiusura per il thread di scrittura
+_CLOSE = object()
+
+# Blocchi in attesa di scrittura oltre i quali append() aspetta il disco
+MAX_PENDING_CHUNKS = 64
+
+# Formati supportati: CSV oppure cartella di blocchi NumPy colonnari (.npz per blocco)
+FORMATS = ("csv", "npz")
+
+
+# Nome di colonna utilizzabile come chiave di un file .npz
+def _column_key(column):
+    return re.sub(r"\W+", "_", column).strip("_").lower()
+
+
+# Scrittore di sessione in streaming: le righe vengono raccolte in blocchi da chunk_rows e
+# scritte su disco da un thread in background durante la sessione. Il file resta con
+# suffisso .part fino a close(), che lo rinomina in modo atomico nel percorso finale.
+# Si usa al posto della lista data: process_frame chiama solo append(). La coda è limitata a
+# max_pending blocchi (la memoria non cresce se il disco è lento) e un errore del thread di
+# scrittura viene sollevato dal primo append() o close() successivo.
+class SessionWriter:
+    def __init__(self, path, columns, fmt="csv", chunk_rows=256, max_pending=MAX_PENDING_CHUNKS):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato non supportato: {fmt}")
+        self.path = path
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._part_path = path + ".part"
+        self._buffer = []
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="scrittura-sessione", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return self.rows
+
+    # Aggiunge una riga; attende il disco solo se max_pending blocchi sono ancora da scrivere
+    def append(self, row):
+        if self._error is not None:
+            raise self._error
+        self._buffer.append(row)
+        self.rows += 1
+        if len(self._buffer) >= self.chunk_rows:
+            self._put(self._buffer)
+            self._buffer = []
+
+    # Accoda un blocco; se il thread di scrittura è terminato per un errore lo solleva
+    # invece di attendere per sempre su una coda piena
+    def _put(self, item):
+        while True:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if self._error is not None:
+                    raise self._error
+
+    def _run(self):
+        try:
+            if self.fmt == "csv":
+                self._write_csv()
+            else:
+                self._write_chunks()
+        except Exception as exc:
+            self._error = exc
+
+    def _write_csv(self):
+        with open(self._part_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            f.flush()
+            while True:
+                chunk = self._queue.get()
+                if chunk is _CLOSE:
+                    break
+                writer.writerows(chunk)
+                f.flush()
+            os.fsync(f.fileno())
+
+    def _write_chunks(self):
+        os.makedirs(self._part_path, exist_ok=True)
+        index = 0
+        while True:
+            chunk = self._queue.get()
+            if chunk is _CLOSE:
+                break
+            columns = list(zip(*chunk))
+            arrays = {_column_key(name): np.asarray(values) for name, values in zip(self.columns, columns)}
+            np.savez(os.path.join(self._part_path, f"chunk_{index:06d}.npz"), **arrays)
+            index += 1
+
+    # Scrive le righe rimaste, attende il thread e pubblica il file in modo atomico
+    def close(self):
+        if self._error is None:
+            if self._buffer:
+                self._put(self._buffer)
+                self._buffer = []
+            self._put(_CLOSE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        if self.fmt == "npz" and os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self._part_path, self.path)
+        print(f"File salvato: {self.path}")
+        return self.path
+
+
+# Rilegge una sessione salvata in blocchi NumPy come dizionario colonna -> array
+def load_chunks(path):
+    chunks = [np.load(chunk) for chunk in sorted(glob.glob(os.path.join(path, "chunk_*.npz")))]
+    if not chunks:
+        return {}
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0].files}
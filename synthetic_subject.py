@@ -0,0 +1,73 @@
+import math
+
+import cv2
+import numpy as np
+
+# Dimensioni di riferimento del disegno (le coordinate vengono scalate sul frame richiesto)
+BASE_WIDTH, BASE_HEIGHT = 640, 480
+
+SKIN = (120, 150, 200)
+SHIRT = (60, 60, 160)
+PANTS = (80, 50, 30)
+BACKGROUND = (180, 190, 200)
+
+
+# Persona disegnata in vista frontale, per riscaldamenti e benchmark quando non ci sono
+# video o telecamere: MediaPipe Pose la rileva, quindi oltre al detector gira anche il
+# modello dei landmark. depth (0-1) abbassa il bacino e piega le ginocchia come in uno squat.
+def person_frame(width=BASE_WIDTH, height=BASE_HEIGHT, depth=0.0):
+    img = np.empty((BASE_HEIGHT, BASE_WIDTH, 3), dtype=np.uint8)
+    img[:] = BACKGROUND
+    cx = BASE_WIDTH // 2
+    drop = int(90 * depth)
+    spread = int(45 * depth)
+
+    # Testa con occhi, naso, bocca e capelli
+    cv2.ellipse(img, (cx, 80 + drop), (28, 36), 0, 0, 360, SKIN, -1)
+    cv2.circle(img, (cx - 10, 72 + drop), 4, (20, 20, 20), -1)
+    cv2.circle(img, (cx + 10, 72 + drop), 4, (20, 20, 20), -1)
+    cv2.line(img, (cx, 78 + drop), (cx, 90 + drop), (80, 100, 150), 2)
+    cv2.ellipse(img, (cx, 100 + drop), (9, 4), 0, 0, 180, (40, 40, 120), 2)
+    cv2.ellipse(img, (cx, 52 + drop), (30, 16), 0, 180, 360, (30, 30, 40), -1)
+    cv2.rectangle(img, (cx - 12, 112 + drop), (cx + 12, 125 + drop), SKIN, -1)
+
+    # Busto e braccia
+    torso = np.array([[cx - 55, 125], [cx + 55, 125], [cx + 45, 270], [cx - 45, 270]]) + (0, drop)
+    cv2.fillPoly(img, [torso], SHIRT)
+    for side in (-1, 1):
+        shoulder = (cx + side * 50, 135 + drop)
+        elbow = (cx + side * 75, 210 + drop)
+        cv2.line(img, shoulder, elbow, SHIRT, 20)
+        cv2.line(img, elbow, (cx + side * 80, 280 + drop), SKIN, 16)
+
+    # Gambe: caviglie ferme, bacino che scende e ginocchia che si aprono
+    for side in (-1, 1):
+        hip = (cx + side * 22, 270 + drop)
+        knee = (cx + side * (28 + spread), 360 + drop // 3)
+        cv2.line(img, hip, knee, PANTS, 28)
+        cv2.line(img, knee, (cx + side * 30, 450), PANTS, 24)
+
+    img = cv2.GaussianBlur(img, (5, 5), 0)
+    if (width, height) != (BASE_WIDTH, BASE_HEIGHT):
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+    return img
+
+
+# Frame BGR di una serie di squat: depth segue un coseno con il periodo indicato
+def squat_frames(count, fps=30.0, period=2.0, width=BASE_WIDTH, height=BASE_HEIGHT):
+    for index in range(count):
+        depth = (1 - math.cos(2 * math.pi * index / (period * fps))) / 2
+        yield person_frame(width, height, depth)
+
+
+# Scrive un video di squat sintetico (MJPG in .avi, disponibile in ogni build di OpenCV)
+def write_squat_clip(path, seconds=4.0, fps=30.0, width=BASE_WIDTH, height=BASE_HEIGHT):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Impossibile scrivere il video {path}")
+    try:
+        for frame in squat_frames(int(seconds * fps), fps, width=width, height=height):
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
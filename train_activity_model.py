@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from activity_features import FEATURE_SCHEMA, NUM_FEATURES, extract_features
+from activity_model import ActivityModel
+from landmark_store import LANDMARKS_FILE, load_landmarks
+
+# Estensioni dei video considerati come sessioni di allenamento
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Cartella di default della cache delle caratteristiche
+DEFAULT_FEATURE_CACHE = "feature_cache"
+
+
+# Architettura del modello originale: (unità, dropout) dei layer nascosti
+HIDDEN_LAYERS = ((256, 0.4), (128, 0.3), (64, 0.2))
+
+# Istanza di MediaPipe Pose del processo worker, creata al primo video
+_worker_pose = None
+
+
+# Sessioni del dataset: dataset/<esercizio>/ contiene video e/o cartelle di landmark
+# salvate da LandmarkRecorder. Restituisce (percorsi, etichette, nomi delle classi).
+def find_sessions(dataset):
+    classes = sorted(name for name in os.listdir(dataset) if os.path.isdir(os.path.join(dataset, name)))
+    sessions, labels = [], []
+    for label, name in enumerate(classes):
+        for folder, dirs, files in os.walk(os.path.join(dataset, name)):
+            if LANDMARKS_FILE in files:
+                sessions.append(folder)
+                labels.append(label)
+                dirs.clear()
+                continue
+            for file_name in sorted(files):
+                if file_name.lower().endswith(VIDEO_EXTENSIONS):
+                    sessions.append(os.path.join(folder, file_name))
+                    labels.append(label)
+    return sessions, np.array(labels, dtype=np.int64), classes
+
+
+# Chiave della cache: contenuto della sorgente + versione delle caratteristiche
+def feature_key(session, pose_config=None):
+    if os.path.isdir(session):
+        digest = hashlib.sha256()
+        with open(os.path.join(session, LANDMARKS_FILE), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        source = digest.hexdigest()
+    else:
+        from pose_cache import cache_key
+        source = cache_key(session, pose_config)
+    return hashlib.sha256(f"{source}:{FEATURE_SCHEMA}".encode()).hexdigest()
+
+
+# Landmark di una sessione: da disco in memory-map oppure stimando la posa sul video
+def _session_landmarks(session, pose_config):
+    global _worker_pose
+    if os.path.isdir(session):
+        return load_landmarks(session)[2]
+    from pose_analysis import extract_landmarks, mp_pose
+    if _worker_pose is None:
+        _worker_pose = mp_pose.Pose(**(pose_config or {}))
+    _worker_pose.reset()
+    recorder, _ = extract_landmarks(session, _worker_pose)
+    return recorder.view()[2]
+
+
+# Worker: caratteristiche di una sessione, dalla cache o calcolate e salvate in cache.
+# I frame senza posa vengono scartati. Restituisce (percorso in cache, righe, da cache).
+def cache_session_features(session, cache_dir, pose_config=None):
+    path = os.path.join(cache_dir, feature_key(session, pose_config) + ".npy")
+    if os.path.exists(path):
+        return path, len(np.load(path, mmap_mode="r")), True
+    features = extract_features(_session_landmarks(session, pose_config))
+    features = features[~np.isnan(features).any(axis=1)]
+    temporary = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(temporary, features)
+    os.replace(temporary, path)
+    return path, len(features), False
+
+
+# Estrae (o ritrova in cache) le caratteristiche di tutte le sessioni su tutti i core e le
+# unisce in due array su disco: features (N, 23) float32 e labels (N,), aperti in memory-map
+def build_dataset(sessions, labels, cache_dir, workers=None, pose_config=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(cache_session_features, sessions, [cache_dir] * len(sessions),
+                                    [pose_config] * len(sessions)))
+    total = sum(rows for _, rows, _ in results)
+    if total == 0:
+        raise ValueError("Nessun frame con posa rilevata nelle sessioni")
+    features_path = os.path.join(cache_dir, "dataset_features.npy")
+    labels_path = os.path.join(cache_dir, "dataset_labels.npy")
+    features = np.lib.format.open_memmap(features_path, mode="w+", dtype=np.float32, shape=(total, NUM_FEATURES))
+    dataset_labels = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int64, shape=(total,))
+    groups = np.empty(total, dtype=np.int64)
+    start = 0
+    for index, ((path, rows, _), label) in enumerate(zip(results, labels)):
+        features[start:start + rows] = np.load(path, mmap_mode="r")
+        dataset_labels[start:start + rows] = label
+        groups[start:start + rows] = index
+        start += rows
+    features.flush()
+    dataset_labels.flush()
+    del features, dataset_labels
+    cached = sum(1 for _, _, from_cache in results if from_cache)
+    return np.load(features_path, mmap_mode="r"), np.load(labels_path, mmap_mode="r"), groups, cached
+
+
+# Media e deviazione standard per colonna, calcolate a blocchi senza caricare tutto in memoria
+def feature_statistics(features, index, chunk_rows=65536):
+    total = np.zeros(NUM_FEATURES)
+    squares = np.zeros(NUM_FEATURES)
+    for start in range(0, len(index), chunk_rows):
+        chunk = features[np.sort(index[start:start + chunk_rows])].astype(np.float64)
+        total += chunk.sum(axis=0)
+        squares += (chunk ** 2).sum(axis=0)
+    mean = total / len(index)
+    std = np.sqrt(np.maximum(squares / len(index) - mean ** 2, 0))
+    return mean, np.where(std > 1e-6, std, 1.0)
+
+
+# Generatore infinito di mini-batch mescolati, standardizzati, letti dal memory-map.
+# Gli indici di ogni batch vengono ordinati così la lettura dal disco è sequenziale.
+def batch_generator(features, labels, index, mean, std, batch_size=256, seed=0):
+    rng = np.random.default_rng(seed)
+    mean = mean.astype(np.float32)
+    std = std.astype(np.float32)
+    while True:
+        order = rng.permutation(index)
+        for start in range(0, len(order), batch_size):
+            batch = np.sort(order[start:start + batch_size])
+            yield (features[batch] - mean) / std, labels[batch]
+
+
+# Divide le righe per sessione: le sessioni di validazione non compaiono nel training
+def split_by_session(groups, validation=0.1, seed=0):
+    sessions = np.unique(groups)
+    rng = np.random.default_rng(seed)
+    held_out = rng.choice(sessions, int(round(len(sessions) * validation)), replace=False) if len(sessions) > 1 else []
+    is_validation = np.isin(groups, held_out)
+    return np.flatnonzero(~is_validation), np.flatnonzero(is_validation)
+
+
+# Stessa architettura del modello originale (Keras importato solo qui)
+def build_keras_model(num_classes):
+    import keras
+    layers = [keras.Input(shape=(NUM_FEATURES,))]
+    for units, rate in HIDDEN_LAYERS:
+        layers += [keras.layers.Dense(units, activation="relu"), keras.layers.BatchNormalization(),
+                   keras.layers.Dropout(rate)]
+    layers.append(keras.layers.Dense(num_classes, activation="softmax"))
+    model = keras.Sequential(layers)
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    return model
+
+
+# Usa tutti i core per le operazioni di TensorFlow (il backend di default di Keras)
+def use_all_cores():
+    import keras
+    if keras.backend.backend() == "tensorflow":
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(os.cpu_count())
+        tf.config.threading.set_inter_op_parallelism_threads(2)
+
+
+# Assorbe la standardizzazione nel primo Dense: il modello esportato accetta le
+# caratteristiche grezze. ((x - m) / s) W + b = x (W / s) + (b - (m / s) W)
+def fold_standardization(model, mean, std):
+    dense = next(layer for layer in model.layers if layer.__class__.__name__ == "Dense")
+    kernel, bias = dense.get_weights()
+    dense.set_weights([kernel / std[:, None], bias - (mean / std) @ kernel])
+
+
+def train(dataset, output, epochs=30, batch_size=256, validation=0.1, cache_dir=DEFAULT_FEATURE_CACHE,
+          workers=None, pose_config=None, seed=0):
+    start = time.perf_counter()
+    sessions, session_labels, classes = find_sessions(dataset)
+    if not sessions:
+        raise ValueError(f"Nessuna sessione trovata in {dataset}")
+    features, labels, groups, cached = build_dataset(sessions, session_labels, cache_dir, workers, pose_config)
+    extraction_time = time.perf_counter() - start
+    print(f"{len(sessions)} sessioni ({cached} dalla cache), {len(labels)} frame, {len(classes)} classi: "
+          f"caratteristiche pronte in {extraction_time:.1f} s")
+
+    train_index, validation_index = split_by_session(groups, validation, seed)
+    mean, std = feature_statistics(features, train_index)
+    use_all_cores()
+    model = build_keras_model(len(classes))
+    fit_args = {}
+    if len(validation_index):
+        fit_args["validation_data"] = batch_generator(features, labels, validation_index, mean, std, batch_size, seed)
+        fit_args["validation_steps"] = -(-len(validation_index) // batch_size)
+    start = time.perf_counter()
+    model.fit(batch_generator(features, labels, train_index, mean, std, batch_size, seed), epochs=epochs,
+              steps_per_epoch=-(-len(train_index) // batch_size), verbose=2, **fit_args)
+    training_time = time.perf_counter() - start
+
+    fold_standardization(model, mean, std)
+    model.save(output)
+    folded_path = os.path.splitext(output)[0] + ".npz"
+    numpy_model = ActivityModel.from_keras(output, class_names=classes)
+    # Solo i modelli con lo schema registrato vengono usati dal riconoscimento in tempo reale
+    numpy_model.feature_schema = FEATURE_SCHEMA
+    numpy_model.save(folded_path)
+
+    # Controllo finale: il modello NumPy riproduce Keras sulle caratteristiche grezze
+    sample = np.asarray(features[np.sort(validation_index if len(validation_index) else train_index)[:1024]])
+    difference = np.abs(model.predict(sample, verbose=0) - numpy_model.predict_proba(sample)).max()
+    print(f"Addestramento in {training_time:.1f} s; modello salvato in {output} e {folded_path} "
+          f"(differenza Keras/NumPy {difference:.2e})")
+    return {"sessions": len(sessions), "frames": len(labels), "classes": classes, "extraction_seconds": extraction_time,
+            "training_seconds": training_time, "model": output, "folded": folded_path}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Addestra il modello di riconoscimento dell'attività sulle sessioni registrate")
+    parser.add_argument("dataset", help="cartella con una sottocartella per esercizio (video o cartelle di landmark)")
+    parser.add_argument("-o", "--output", default="activity_model_retrained.keras")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--validation", type=float, default=0.1, help="frazione di sessioni per la validazione")
+    parser.add_argument("--cache-dir", default=DEFAULT_FEATURE_CACHE)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="processi per l'estrazione (default: tutti i core)")
+    parser.add_argument("--model-complexity", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    train(args.dataset, args.output, args.epochs, args.batch_size, args.validation, args.cache_dir, args.workers,
+          {"model_complexity": args.model_complexity}, args.seed)
+
+
+if __name__ == "__main__":
+    main()
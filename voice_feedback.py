@@ -0,0 +1,81 @@
+import queue
+import threading
+import time
+
+
+# Segnale di chiusura per il thread di sintesi vocale
+_STOP = object()
+
+
+# Feedback vocale non bloccante: i messaggi vanno in coda e un thread dedicato li pronuncia.
+# - messaggi dello stesso tipo ancora in attesa vengono uniti (resta il più recente);
+# - ogni tipo viene ripetuto al massimo una volta ogni min_interval secondi;
+# - i messaggi rimasti in coda più di max_age secondi vengono scartati perché non più attuali.
+class VoiceFeedback:
+    def __init__(self, min_interval=3.0, max_age=2.0, max_pending=4):
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._last_spoken = {}
+        self._lock = threading.Lock()
+        self._metrics = {"spoken": 0, "coalesced": 0, "rate_limited": 0, "stale": 0, "queue_full": 0}
+        self._thread = threading.Thread(target=self._run, name="feedback-vocale", daemon=True)
+        self._thread.start()
+
+    # Accoda un messaggio senza mai bloccare; kind identifica il tipo di messaggio
+    def say(self, message, kind=None):
+        kind = kind or message
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_spoken.get(kind, float("-inf")) < self.min_interval:
+                self._metrics["rate_limited"] += 1
+                return False
+            if kind in self._pending:
+                self._pending[kind] = (message, now)
+                self._metrics["coalesced"] += 1
+                return False
+            self._pending[kind] = (message, now)
+            try:
+                self._queue.put_nowait(kind)
+            except queue.Full:
+                del self._pending[kind]
+                self._metrics["queue_full"] += 1
+                return False
+        return True
+
+    # Thread di sintesi: pyttsx3 viene importato, creato e usato solo qui, quindi
+    # l'inizializzazione del motore vocale non rallenta l'avvio dell'interfaccia
+    def _run(self):
+        import pyttsx3
+        engine = pyttsx3.init()
+        while True:
+            kind = self._queue.get()
+            if kind is _STOP:
+                break
+            with self._lock:
+                message, queued_at = self._pending.pop(kind)
+            if time.monotonic() - queued_at > self.max_age:
+                with self._lock:
+                    self._metrics["stale"] += 1
+                continue
+            with self._lock:
+                self._last_spoken[kind] = time.monotonic()
+                self._metrics["spoken"] += 1
+            engine.say(message)
+            engine.runAndWait()
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["dropped"] = metrics["rate_limited"] + metrics["stale"] + metrics["queue_full"]
+        return metrics
+
+    def print_stats(self):
+        metrics = self.metrics()
+        print(f"Feedback vocale: {metrics['spoken']} pronunciati, {metrics['coalesced']} uniti, "
+              f"{metrics['dropped']} scartati")
+
+    def close(self, timeout=None):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
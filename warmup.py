@@ -0,0 +1,88 @@
+import threading
+import time
+
+# Istante di riferimento per i tempi di avvio: il modulo va importato per primo
+START = time.perf_counter()
+
+
+# Secondi trascorsi dall'avvio
+def since_start():
+    return time.perf_counter() - START
+
+
+# Caricamento in background di una risorsa pesante (import, grafo di MediaPipe, modelli)
+# mentre l'interfaccia è già visibile. get() restituisce la risorsa, attendendo se serve.
+class BackgroundLoader:
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.error = None
+        self.seconds = None
+        self.ready_at = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"caricamento-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.value = self.factory()
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.ready_at = since_start()
+            self._done.set()
+        if self.error is None:
+            print(f"{self.name} pronto dopo {self.ready_at:.2f} s dall'avvio (caricamento {self.seconds:.2f} s)")
+        else:
+            print(f"Errore nel caricamento di {self.name}: {self.error}")
+
+    def ready(self):
+        return self._done.is_set()
+
+    # Attende la fine del caricamento senza messaggi (per caricamenti in catena)
+    def wait(self):
+        self._done.wait()
+
+    def get(self):
+        if not self._done.is_set():
+            print(f"Attendo il caricamento di {self.name}...")
+            self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+# Riscalda Pose su alcuni frame con una persona disegnata: su un frame vuoto girerebbe solo
+# il detector e la prima inferenza vera pagherebbe l'avvio del modello dei landmark. Un
+# frame vuoto finale fa perdere la posa, così tracking e smoothing ripartono dal primo
+# frame reale invece che dalla persona disegnata.
+def warm_up_pose(pose, frames=5):
+    import cv2
+    import numpy as np
+    from synthetic_subject import squat_frames
+
+    for frame in squat_frames(frames):
+        pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    pose.process(np.zeros_like(frame))
+    return pose
+
+
+# Stampa una sola volta il tempo dall'avvio alla prima inferenza su un frame reale
+_first_inference = threading.Event()
+
+
+def report_first_inference(latency):
+    if not _first_inference.is_set():
+        _first_inference.set()
+        print(f"Prima inferenza su un frame reale dopo {since_start():.2f} s dall'avvio ({latency * 1e3:.0f} ms)")
+
+
+# Stampa quando la prima finestra Tk è stata disegnata
+def report_first_window(root):
+    root.after_idle(lambda: print(f"Prima finestra visibile dopo {since_start():.2f} s dall'avvio"))